@@ -0,0 +1,46 @@
+"""add page_amount_rollup
+
+Revision ID: 5f9e0a7b2c44
+Revises: d3a85f0c6e21
+Create Date: 2025-02-12 16:40:27.905113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f9e0a7b2c44'
+down_revision: Union[str, None] = 'd3a85f0c6e21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('page_amount_rollup',
+    sa.Column('platform_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('model_name', sa.String(), nullable=False),
+    sa.Column('total_amount', sa.Numeric(), nullable=False),
+    sa.Column('row_count', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('platform_id', 'day', 'model_name')
+    )
+    op.create_index('ix_page_amount_rollup_day', 'page_amount_rollup', ['day'], unique=False)
+
+    # Backfill con los datos ya procesados; como en rebuild, solo los archivos terminados
+    # (statusenum guarda el nombre del miembro: 'COMPLETED')
+    op.execute(
+        "INSERT INTO page_amount_rollup (platform_id, day, model_name, total_amount, row_count) "
+        "SELECT s.platform_id, s.date, p.model_name, sum(p.amount), count(*) "
+        "FROM page_processed_data p JOIN page_staging_data s ON p.staging_data_id = s.id "
+        "WHERE s.status = 'COMPLETED' "
+        "GROUP BY s.platform_id, s.date, p.model_name"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_page_amount_rollup_day', table_name='page_amount_rollup')
+    op.drop_table('page_amount_rollup')
@@ -0,0 +1,30 @@
+"""add page_staging_data.fingerprint
+
+Revision ID: a6d0c3f81e57
+Revises: e4b7a2d9c813
+Create Date: 2025-02-18 10:41:26.903114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d0c3f81e57'
+down_revision: Union[str, None] = 'e4b7a2d9c813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Los registros ya descargados quedan sin huella: se procesan siempre completos
+    op.add_column('page_staging_data', sa.Column('fingerprint', sa.String(length=64), nullable=True))
+    op.create_index('ix_page_staging_data_platform_id_fingerprint', 'page_staging_data',
+                    ['platform_id', 'fingerprint'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_page_staging_data_platform_id_fingerprint', table_name='page_staging_data')
+    op.drop_column('page_staging_data', 'fingerprint')
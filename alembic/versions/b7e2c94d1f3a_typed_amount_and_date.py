@@ -0,0 +1,53 @@
+"""typed amount and date columns
+
+Revision ID: b7e2c94d1f3a
+Revises: 88a6078b9c85
+Create Date: 2025-02-10 10:24:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c94d1f3a'
+down_revision: Union[str, None] = '88a6078b9c85'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backfill: dejar 'amount' como número en texto (sin '$', comas ni espacios) antes del cast
+    op.execute(
+        "UPDATE page_processed_data "
+        "SET amount = regexp_replace(amount, '[$,[:space:]]', '', 'g') "
+        "WHERE amount ~ '[$,[:space:]]'"
+    )
+    op.alter_column('page_processed_data', 'amount',
+               existing_type=sa.String(),
+               type_=sa.Numeric(),
+               existing_nullable=False,
+               postgresql_using='amount::numeric')
+
+    # Backfill: las fechas se guardaban como texto 'YYYY-MM-DD'
+    op.execute("UPDATE page_staging_data SET date = btrim(date) WHERE date <> btrim(date)")
+    op.alter_column('page_staging_data', 'date',
+               existing_type=sa.String(),
+               type_=sa.Date(),
+               existing_nullable=False,
+               postgresql_using='date::date')
+
+
+def downgrade() -> None:
+    op.alter_column('page_staging_data', 'date',
+               existing_type=sa.Date(),
+               type_=sa.String(),
+               existing_nullable=False,
+               postgresql_using="to_char(date, 'YYYY-MM-DD')")
+    op.alter_column('page_processed_data', 'amount',
+               existing_type=sa.Numeric(),
+               type_=sa.String(),
+               existing_nullable=False,
+               postgresql_using='amount::text')
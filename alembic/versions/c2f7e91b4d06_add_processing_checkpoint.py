@@ -0,0 +1,41 @@
+"""add page_processing_checkpoint and page_staging_data.heartbeat_at
+
+Revision ID: c2f7e91b4d06
+Revises: a6d0c3f81e57
+Create Date: 2025-02-21 16:05:48.271390
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c2f7e91b4d06'
+down_revision: Union[str, None] = 'a6d0c3f81e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Los registros que ya estaban en 'processing' quedan sin heartbeat: se consideran vencidos
+    op.add_column('page_staging_data', sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_page_staging_data_status_heartbeat_at', 'page_staging_data',
+                    ['status', 'heartbeat_at'], unique=False)
+    op.create_table('page_processing_checkpoint',
+    sa.Column('staging_data_id', sa.Integer(), nullable=False),
+    sa.Column('chunk_index', sa.Integer(), nullable=False),
+    sa.Column('rows_read', sa.BigInteger(), nullable=False),
+    sa.Column('rows_inserted', sa.BigInteger(), nullable=False),
+    sa.Column('output_offset', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['staging_data_id'], ['page_staging_data.id'], ),
+    sa.PrimaryKeyConstraint('staging_data_id', 'chunk_index')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('page_processing_checkpoint')
+    op.drop_index('ix_page_staging_data_status_heartbeat_at', table_name='page_staging_data')
+    op.drop_column('page_staging_data', 'heartbeat_at')
@@ -0,0 +1,50 @@
+"""staging lookup indexes
+
+Revision ID: d3a85f0c6e21
+Revises: b7e2c94d1f3a
+Create Date: 2025-02-11 09:12:05.774120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a85f0c6e21'
+down_revision: Union[str, None] = 'b7e2c94d1f3a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # La restricción única no se puede crear si ya hay duplicados: se deben resolver a mano
+    duplicates = op.get_bind().execute(sa.text(
+        "SELECT platform_id, date, count(*) FROM page_staging_data "
+        "GROUP BY platform_id, date HAVING count(*) > 1"
+    )).fetchall()
+    if duplicates:
+        detail = ", ".join(f"platform_id={row[0]} date={row[1]} ({row[2]})" for row in duplicates)
+        raise RuntimeError(f"Duplicated page_staging_data rows, resolve them before upgrading: {detail}")
+
+    # Los índices sobre 'id' duplican los de la clave primaria
+    op.drop_index('ix_page_staging_data_id', table_name='page_staging_data')
+    op.drop_index('ix_page_processed_data_id', table_name='page_processed_data')
+    op.drop_index('ix_page_staging_log_id', table_name='page_staging_log')
+
+    op.create_unique_constraint('uq_page_staging_data_platform_id_date', 'page_staging_data', ['platform_id', 'date'])
+    op.create_index('ix_page_staging_data_date_status', 'page_staging_data', ['date', 'status'], unique=False)
+    op.create_index(op.f('ix_page_processed_data_staging_data_id'), 'page_processed_data', ['staging_data_id'], unique=False)
+    op.create_index(op.f('ix_page_staging_log_staging_data_id'), 'page_staging_log', ['staging_data_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_page_staging_log_staging_data_id'), table_name='page_staging_log')
+    op.drop_index(op.f('ix_page_processed_data_staging_data_id'), table_name='page_processed_data')
+    op.drop_index('ix_page_staging_data_date_status', table_name='page_staging_data')
+    op.drop_constraint('uq_page_staging_data_platform_id_date', 'page_staging_data', type_='unique')
+
+    op.create_index('ix_page_staging_log_id', 'page_staging_log', ['id'], unique=False)
+    op.create_index('ix_page_processed_data_id', 'page_processed_data', ['id'], unique=False)
+    op.create_index('ix_page_staging_data_id', 'page_staging_data', ['id'], unique=False)
@@ -0,0 +1,27 @@
+"""add page_staging_data.file_path_sidecar
+
+Revision ID: e4b7a2d9c813
+Revises: 5f9e0a7b2c44
+Create Date: 2025-02-14 09:12:03.417520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b7a2d9c813'
+down_revision: Union[str, None] = '5f9e0a7b2c44'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Los .xlsx ya descargados no tienen sidecar: se siguen leyendo desde el libro original
+    op.add_column('page_staging_data', sa.Column('file_path_sidecar', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('page_staging_data', 'file_path_sidecar')
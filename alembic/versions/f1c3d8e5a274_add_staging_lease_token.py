@@ -0,0 +1,28 @@
+"""add page_staging_data.lease_token
+
+Revision ID: f1c3d8e5a274
+Revises: c2f7e91b4d06
+Create Date: 2025-02-24 11:32:07.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f1c3d8e5a274'
+down_revision: Union[str, None] = 'c2f7e91b4d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Los registros que ya estaban en 'processing' quedan sin lease: solo se retoman cuando
+    # vence su heartbeat
+    op.add_column('page_staging_data', sa.Column('lease_token', sa.String(length=36), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('page_staging_data', 'lease_token')
@@ -1,7 +1,11 @@
 from fastapi import FastAPI
+from fastapi.responses import Response
 from contextlib import asynccontextmanager
 from app.api.routes import pages
 from app.config.nats_service import nats_client, connect_nats, close_nats, listen_to_nats
+from app.config.settings import SCHEDULER_ENABLED
+from app.core.metrics import CONTENT_TYPE, registry
+from app.services.scheduler import scheduler
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -12,8 +16,16 @@ async def lifespan(app: FastAPI):
     # Iniciar el listener para escuchar mensajes
     await listen_to_nats()
 
+    # Procesar los pendientes de forma continua (comparte el pool del dispatcher)
+    if SCHEDULER_ENABLED:
+        scheduler.start()
+        print("Scheduler iniciado")
+
     yield  # Mantener la aplicación en ejecución
 
+    # Detener el scheduler antes de cerrar los pools del dispatcher
+    await scheduler.stop()
+
     # Cerrar la conexión de NATS al cerrar la aplicación
     await close_nats()
     print("NATS desconectado en el apagado")
@@ -23,6 +35,11 @@ app = FastAPI(debug=True, lifespan=lifespan)
 
 print("App initialized successfully")
 
+# Métricas de este proceso en formato de Prometheus
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
+
 # Incluye los enrutadores
 # app.include_router(pages.router, prefix="", tags=["pages"])
 # print("Router included successfully")
@@ -5,6 +5,7 @@ from app.domain.schemas.page_schema import SaveToDataLakeSchema, StagingDataResp
 from app.domain.repositories.page_repository import PageRepository
 from app.domain.repositories.page_log_repository import PageLogRepository
 from app.domain.repositories.page_processed_repository import PageProcessedRepository
+from app.domain.repositories.page_rollup_repository import PageRollupRepository
 from app.core.database import SessionLocal
 from sqlalchemy.orm import Session
 from app.config.nats_service import nats_client
@@ -28,10 +29,14 @@ def get_page_log_repository(db: Session = Depends(get_db)) -> PageLogRepository:
 def get_page_processed_repository(db: Session = Depends(get_db)) -> PageProcessedRepository:
     return PageProcessedRepository(db) 
 
+def get_page_rollup_repository(db: Session = Depends(get_db)) -> PageRollupRepository:
+    return PageRollupRepository(db) 
+
 def get_page_service(page_staging: PageRepository = Depends(get_page_repository), 
                      page_log: PageLogRepository = Depends(get_page_log_repository),
-                     page_processed: PageProcessedRepository = Depends(get_page_processed_repository)):
-    return PageService(page_staging, page_log, page_processed)
+                     page_processed: PageProcessedRepository = Depends(get_page_processed_repository),
+                     page_rollup: PageRollupRepository = Depends(get_page_rollup_repository)):
+    return PageService(page_staging, page_log, page_processed, page_rollup)
 
 @router.post("/pages/", response_model=StagingDataResponseSchema, summary="Create a new page", description="Creates a new page staging data record")
 def create_page(
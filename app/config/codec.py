@@ -0,0 +1,107 @@
+import gzip
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from app.config.settings import CODEC_COMPRESSION_THRESHOLD
+
+# orjson, msgpack y zstandard son opcionales: sin ellos se usa json y gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+GZIP = "gzip"
+ZSTD = "zstd"
+
+
+# Tipos que no serializan ni json ni msgpack de forma nativa
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Type is not serializable: {type(value).__name__}")
+
+
+def _serialize(payload, content_type):
+    if content_type == MSGPACK:
+        return msgpack.packb(payload, default=_default)
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, default=_default).encode()
+
+
+def _compress(data, encoding):
+    if encoding == ZSTD:
+        return zstandard.ZstdCompressor().compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(data, encoding):
+    if encoding == ZSTD:
+        return zstandard.ZstdDecompressor().decompress(data)
+    if encoding == GZIP:
+        return gzip.decompress(data)
+    return data
+
+
+def available_encodings():
+    return [ZSTD, GZIP] if zstandard is not None else [GZIP]
+
+
+# Formato de la respuesta según los headers del mensaje recibido:
+#   Accept: application/msgpack        -> msgpack (si está instalado), si no JSON
+#   Accept-Encoding: zstd, gzip        -> compresión sobre CODEC_COMPRESSION_THRESHOLD bytes
+# Sin headers la respuesta es JSON sin comprimir, como antes.
+def negotiate(headers):
+    headers = headers or {}
+    accept = headers.get("Accept", "")
+    content_type = MSGPACK if MSGPACK in accept and msgpack is not None else JSON
+
+    accepted = [item.strip() for item in headers.get("Accept-Encoding", "").split(",")]
+    encoding = next((item for item in available_encodings() if item in accepted), None)
+    return content_type, encoding
+
+
+# Retorna (bytes, headers) listos para publicar. headers es None en el caso por defecto
+# (JSON sin comprimir) para no exigir soporte de headers a los clientes antiguos.
+def encode(payload, content_type=JSON, encoding=None):
+    data = _serialize(payload, content_type)
+
+    headers = {}
+    if content_type != JSON:
+        headers["Content-Type"] = content_type
+    if encoding and len(data) >= CODEC_COMPRESSION_THRESHOLD:
+        data = _compress(data, encoding)
+        headers["Content-Encoding"] = encoding
+
+    return data, headers or None
+
+
+# Lee el cuerpo de un mensaje recibido respetando Content-Type y Content-Encoding
+def decode(msg):
+    if not msg.data:
+        return {}
+
+    headers = msg.headers or {}
+    data = _decompress(msg.data, headers.get("Content-Encoding"))
+    if headers.get("Content-Type") == MSGPACK and msgpack is not None:
+        return msgpack.unpackb(data)
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,103 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from app.config.settings import (
+    NATS_DEFAULT_CONCURRENCY,
+    NATS_PROCESS_SUBJECTS,
+    NATS_PROCESS_WORKERS,
+    NATS_SUBJECT_CONCURRENCY,
+    NATS_THREAD_WORKERS,
+)
+from app.core.metrics import NATS_HANDLER_SECONDS, NATS_IN_FLIGHT, NATS_MESSAGES
+
+
+class Dispatcher:
+    def __init__(self, thread_workers: int, process_workers: int, process_subjects: list,
+                 subject_limits: dict, default_limit: int):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self.process_subjects = set(process_subjects)
+        self.subject_limits = subject_limits
+        self.default_limit = default_limit
+
+        self._thread_pool = None
+        self._process_pool = None
+        self._semaphores = {}
+        self._tasks = set()
+
+    def _semaphore(self, subject: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(subject)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.subject_limits.get(subject, self.default_limit))
+            self._semaphores[subject] = semaphore
+        return semaphore
+
+    def _executor(self, subject: str):
+        if subject in self.process_subjects:
+            if self._process_pool is None:
+                # 'spawn' evita heredar el event loop y las conexiones abiertas del proceso padre
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(
+                max_workers=self.thread_workers,
+                thread_name_prefix="nats-worker",
+            )
+        return self._thread_pool
+
+    # Ejecuta una función bloqueante fuera del event loop
+    async def run(self, subject: str, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor(subject), fn, *args)
+
+    # Envuelve el callback de un subject: cada mensaje se atiende en su propia tarea,
+    # limitada por el semáforo del subject. Mientras el límite está lleno el callback
+    # no retorna, por lo que los mensajes se acumulan en la suscripción de NATS.
+    def handler(self, subject: str, cb):
+        semaphore = self._semaphore(subject)
+
+        async def wrapper(msg):
+            await semaphore.acquire()
+            NATS_IN_FLIGHT.inc(subject=subject)
+            task = asyncio.create_task(cb(msg))
+            self._tasks.add(task)
+            task.add_done_callback(partial(self._task_done, subject, semaphore, time.perf_counter()))
+
+        return wrapper
+
+    def _task_done(self, subject: str, semaphore: asyncio.Semaphore, started: float, task: asyncio.Task):
+        self._tasks.discard(task)
+        semaphore.release()
+        NATS_IN_FLIGHT.dec(subject=subject)
+        NATS_HANDLER_SECONDS.observe(time.perf_counter() - started, subject=subject)
+
+        failed = not task.cancelled() and task.exception() is not None
+        NATS_MESSAGES.inc(subject=subject, result="error" if failed else "ok")
+        if failed:
+            print(f"Error en el handler de '{subject}': {task.exception()!r}")
+
+    async def shutdown(self):
+        # Esperar a que terminen los mensajes en curso antes de cerrar los pools
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=True)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=True)
+            self._process_pool = None
+
+
+dispatcher = Dispatcher(
+    thread_workers=NATS_THREAD_WORKERS,
+    process_workers=NATS_PROCESS_WORKERS,
+    process_subjects=NATS_PROCESS_SUBJECTS,
+    subject_limits=NATS_SUBJECT_CONCURRENCY,
+    default_limit=NATS_DEFAULT_CONCURRENCY,
+)
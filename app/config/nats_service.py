@@ -1,52 +1,54 @@
-import json
 import asyncio
+from datetime import datetime
 from nats.aio.client import Client as NATS
 from fastapi import FastAPI
-import requests
-from app.config.settings import NATS_URL
+from app.config.settings import (
+    DB_READ_MODE,
+    GET_ALL_PAGES_DEFAULT_LIMIT,
+    GET_ALL_PAGES_MAX_LIMIT,
+    NATS_QUEUE_GROUP,
+    NATS_THREAD_WORKERS,
+    NATS_URL,
+)
+from app.config.codec import decode, encode, negotiate
+from app.config.dispatcher import dispatcher
 from nats.aio.msg import Msg
-from app.core.database import SessionLocal
-from sqlalchemy.orm import Session
-from app.domain.repositories.page_repository import PageRepository
-from app.domain.repositories.page_log_repository import PageLogRepository
-from app.domain.repositories.page_processed_repository import PageProcessedRepository
-from app.services.page_service import PageService
+from app.core.cache import (
+    all_pages_key,
+    invalidate_date,
+    reply_cache,
+    staging_from_date_key,
+    total_amount_month_key,
+)
+from app.core.async_database import dispose_async_engine
+from app.core.database import pool_stats
+from app.core.metrics import registry
+from app.domain.models.page_model import as_date
+from app.services.jobs import (
+    ASYNC_READ_JOBS,
+    get_all_pages_job,
+    get_all_pages_page_job,
+    get_staging_from_date_job,
+    processing_data_job,
+    resume_processing_job,
+    save_to_data_lake_batch_job,
+    save_to_data_lake_job,
+    total_amount_month_job,
+)
 
 app = FastAPI()
 
 nats_client = NATS()
 
-# Función para obtener la sesión de la base de datos
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-# Creación de los repositorios
-def get_page_repository(db: Session) -> PageRepository:
-    return PageRepository(db)
-
-def get_page_log_repository(db: Session) -> PageLogRepository:
-    return PageLogRepository(db)
-
-def get_page_processed_repository(db: Session) -> PageProcessedRepository:
-    return PageProcessedRepository(db)
-
-# Instanciación de PageService
-def get_page_service(db: Session) -> PageService:
-    page_repository = get_page_repository(db)
-    page_log_repository = get_page_log_repository(db)
-    page_processed_repository = get_page_processed_repository(db)
-    return PageService(page_repository, page_log_repository, page_processed_repository)
-
 # Conexión con NATS
 async def connect_nats():
     await nats_client.connect(NATS_URL)
     print("Conectado al servidor NATS")
 
 async def close_nats():
+    # Terminar los mensajes en curso (que todavía publican su respuesta) antes de cerrar
+    await dispatcher.shutdown()
+    await dispose_async_engine()
     await nats_client.close()
 
 # Manejador del mensaje para 'test_nats'
@@ -59,143 +61,252 @@ async def handle_test_nats(msg: Msg):
         "data": test
     }
 
-    test_json = json.dumps(res)
-    await nats_client.publish(msg.reply, test_json.encode())
+    await publish_reply(msg, res)
+
+# Ejecuta un trabajo de lectura según DB_READ_MODE
+async def run_read(subject, job, *args):
+    if DB_READ_MODE == "async":
+        return await ASYNC_READ_JOBS[job](*args)
+    return await dispatcher.run(subject, job, *args)
+
+# Valida que 'date' venga en los parámetros con formato YYYY-MM-DD
+def get_date_param(params):
+    if not params or not isinstance(params.get('date'), str):
+        return None
+    try:
+        as_date(params['date'])
+    except ValueError:
+        return None
+    return params['date']
+
+# Publica la respuesta con el formato que pidió el mensaje (ver app/config/codec.py)
+async def publish_reply(msg, res, reply_format=None):
+    payload, headers = encode(res, *(reply_format or negotiate(msg.headers)))
+    await nats_client.publish(msg.reply, payload, headers=headers)
+
+# Lecturas cacheadas: se guarda la respuesta ya codificada, una por formato. Si hubo una
+# escritura mientras se leía, la respuesta se envía pero no se guarda.
+async def cached_reply(msg, key, subject, job, *args):
+    reply_format = negotiate(msg.headers)
+    cache_key = (key, reply_format)
+    cached = reply_cache.get(cache_key)
+    if cached is None:
+        version = reply_cache.version()
+        res = await run_read(subject, job, *args)
+        cached = encode(res, *reply_format)
+        if res["status"] == 200:
+            reply_cache.set(cache_key, cached, version)
+
+    payload, headers = cached
+    await nats_client.publish(msg.reply, payload, headers=headers)
+
+# Valida los parámetros de paginación de 'get_all_pages'. Retorna (cursor, limit, error)
+def get_page_params(params):
+    cursor = params.get('cursor')
+    limit = params.get('limit', GET_ALL_PAGES_DEFAULT_LIMIT)
+    if cursor is not None and (not isinstance(cursor, int) or isinstance(cursor, bool)):
+        return None, None, "Invalid 'cursor' in the parameters"
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= GET_ALL_PAGES_MAX_LIMIT:
+        return None, None, f"Invalid 'limit' in the parameters (1 to {GET_ALL_PAGES_MAX_LIMIT})"
+    return cursor, limit, None
 
 # Manejador del mensaje para 'get_all_pages'
+# - sin parámetros: todos los registros en una respuesta (cacheada)
+# - {"cursor": id, "limit": n}: una página; 'next_cursor' es el cursor de la siguiente
+# - {"stream": true, "limit": n}: publica en el inbox de respuesta una secuencia de chunks
+#   de hasta n registros y al final un mensaje con "end": true
 async def handle_get_all_pages(msg: Msg):
-    db = next(get_db())
-    page_service = get_page_service(db)
+    received_data = decode(msg)
+    params = received_data.get('data', None)
+    if not params:
+        await cached_reply(msg, all_pages_key(), "get_all_pages", get_all_pages_job)
+        return
 
-    data = page_service.get_all()
-    data_serializable = [item.to_dict() for item in data]
-    res = {
-        "status": 200,
-        "message": "Success",
-        "data": data_serializable
-    }
-    data_json = json.dumps(res)
-    await nats_client.publish(msg.reply, data_json.encode())
+    cursor, limit, error = get_page_params(params)
+    if error:
+        res = {
+            "status": 400,
+            "message": error
+        }
+    elif params.get('stream'):
+        await stream_all_pages(msg, cursor, limit)
+        return
+    else:
+        res = await run_read("get_all_pages", get_all_pages_page_job, cursor, limit)
 
-async def handle_total_amount_month(msg: Msg):
-    db = next(get_db())
-    page_service = get_page_service(db)
+    await publish_reply(msg, res)
 
-    data = page_service.total_amount_month()
-    data_serializable = json.dumps(float(data))
-    res = {
+async def stream_all_pages(msg, cursor, limit):
+    reply_format = negotiate(msg.headers)
+    chunks = 0
+    total = 0
+    while True:
+        res = await run_read("get_all_pages", get_all_pages_page_job, cursor, limit)
+        if res["data"]:
+            chunk = {
+                "status": 200,
+                "message": "Success",
+                "chunk": chunks,
+                "data": res["data"]
+            }
+            await publish_reply(msg, chunk, reply_format)
+            chunks += 1
+            total += len(res["data"])
+
+        cursor = res["next_cursor"]
+        if cursor is None:
+            break
+
+    end = {
         "status": 200,
-        "message": "Success",
-        "data": data_serializable
+        "message": "End",
+        "end": True,
+        "chunks": chunks,
+        "total": total
     }
-    data_json = json.dumps(res)
-    await nats_client.publish(msg.reply, data_json.encode())    
+    await publish_reply(msg, end, reply_format)
+
+async def handle_total_amount_month(msg: Msg):
+    current_date = datetime.now()
+    key = total_amount_month_key(current_date.year, current_date.month)
+    await cached_reply(msg, key, "total_amount_month", total_amount_month_job)
 
 async def handle_get_staging_from_date(msg: Msg):
-    db = next(get_db())
-    page_service = get_page_service(db)
-    received_data = json.loads(msg.data.decode())
-    params = received_data.get('data', None)
-    if params and 'date' in params:
-        date = params['date']
-        data = page_service.get_staging_from_date(date)
-        
-        data_serializable = [item.to_dict() for item in data]
-        res = {
-            "status": 200,
-            "message": "Success",
-            "data": data_serializable
-        }
+    received_data = decode(msg)
+    date = get_date_param(received_data.get('data', None))
+    if date:
+        await cached_reply(msg, staging_from_date_key(date), "get_staging_from_date",
+                           get_staging_from_date_job, date)
     else:
         res = {
             "status": 400,
             "message": "Missing or invalid 'date' in the parameters"
         }
+        await publish_reply(msg, res)
 
-    data_json = json.dumps(res)
-    await nats_client.publish(msg.reply, data_json.encode())   
-    
 async def handle_processing_data(msg: Msg):
-    db = next(get_db())
-    page_service = get_page_service(db)
-    received_data = json.loads(msg.data.decode())
-    params = received_data.get('data', None)
-    if params and 'date' in params:
-        date = params['date']
-        data = page_service.processing_data(date)
-        
-        data_serializable = [item.to_dict() for item in data]
-        res = {
-            "status": 200,
-            "message": "Success",
-            "data": data_serializable
-        }
+    received_data = decode(msg)
+    date = get_date_param(received_data.get('data', None))
+    if date:
+        res = await dispatcher.run("processing_data", processing_data_job, date)
+        # El trabajo pudo correr en otro proceso: invalidar también la caché de este
+        invalidate_date(date)
     else:
         res = {
             "status": 400,
             "message": "Missing or invalid 'date' in the parameters"
         }
 
-    data_json = json.dumps(res)
-    await nats_client.publish(msg.reply, data_json.encode())
+    await publish_reply(msg, res)
 
-async def handle_save_to_data_lake(msg: Msg):
-    db = next(get_db())
-    page_service = get_page_service(db)
+# Retoma los archivos cuyo procesamiento quedó cortado. 'date' es opcional: sin ella se
+# revisan todas las fechas.
+async def handle_resume_processing(msg: Msg):
+    received_data = decode(msg)
+    params = received_data.get('data', None)
+    date = get_date_param(params)
+
+    if params and 'date' in params and date is None:
+        res = {
+            "status": 400,
+            "message": "Invalid 'date' in the parameters"
+        }
+    else:
+        res = await dispatcher.run("resume_processing", resume_processing_job, date)
+        for item in res['data']:
+            invalidate_date(item['date'])
+
+    await publish_reply(msg, res)
 
-    received_data = json.loads(msg.data.decode())
+async def handle_save_to_data_lake(msg: Msg):
+    received_data = decode(msg)
     params = received_data.get('data', None)
+    date = get_date_param(params)
 
-    if params and 'date' in params and 'page_id' in params:
+    if date and 'page_id' in params:
         request_params = {
-            "date": params['date'],
+            "date": date,
             "page_id": params['page_id']
         }
+        res = await dispatcher.run("save_to_data_lake", save_to_data_lake_job, request_params)
+        invalidate_date(date)
+    else:
+        res = {
+            "status": 400,
+            "message": "Missing or invalid 'date' or 'page_id' in the parameters"
+        }
 
-        try:
-            data = page_service.save_to_data_lake(request_params)
-            data_serializable = [data.to_dict()]
+    await publish_reply(msg, res)
 
-            res = {
-                "status": 200,
-                "message": "Success",
-                "data": data_serializable
-            }
-        except ValueError as e:
-            # Captura de ValueError (si el registro ya existe)
-            res = {
-                "status": 400,
-                "message": f"Error: {str(e)}"
-            }
-        except requests.exceptions.RequestException as e:
-            # Captura de errores de red o problemas con la API
-            res = {
-                "status": 500,
-                "message": f"API request failed: {str(e)}"
-            }
-        except Exception as e:
-            # Captura de cualquier otro error inesperado
-            res = {
-                "status": 500,
-                "message": f"Unexpected error: {str(e)}"
-            }
+async def handle_cache_stats(msg: Msg):
+    res = {
+        "status": 200,
+        "message": "Success",
+        "data": reply_cache.stats()
+    }
+    await publish_reply(msg, res)
+
+# Estado del pool de conexiones de esta réplica, junto a los hilos que lo comparten
+async def handle_db_pool_stats(msg: Msg):
+    res = {
+        "status": 200,
+        "message": "Success",
+        "data": {**pool_stats(), "thread_workers": NATS_THREAD_WORKERS}
+    }
+    await publish_reply(msg, res)
+
+# Métricas de esta réplica en formato de texto de Prometheus (las mismas de GET /metrics)
+async def handle_metrics(msg: Msg):
+    res = {
+        "status": 200,
+        "message": "Success",
+        "data": registry.render()
+    }
+    await publish_reply(msg, res)
+
+async def handle_save_to_data_lake_batch(msg: Msg):
+    received_data = decode(msg)
+    params = received_data.get('data', None)
+    items = params.get('items') if params else None
+
+    if isinstance(items, list) and items and all(
+        isinstance(item, dict) and get_date_param(item) and 'page_id' in item for item in items
+    ):
+        request_items = [{"date": item['date'], "page_id": item['page_id']} for item in items]
+        res = await dispatcher.run("save_to_data_lake_batch", save_to_data_lake_batch_job, request_items)
+        for item in request_items:
+            invalidate_date(item['date'])
     else:
         res = {
             "status": 400,
-            "message": "Missing or invalid 'date' or 'page_id' in the parameters"
+            "message": "Missing or invalid 'items' (list of 'date' and 'page_id') in the parameters"
         }
 
-    data_json = json.dumps(res)
-    await nats_client.publish(msg.reply, data_json.encode())
-
-# Escucha de los mensajes de NATS
-async def listen_to_nats():
-    await nats_client.subscribe("test_nats", cb=handle_test_nats)
-    await nats_client.subscribe("get_all_pages", cb=handle_get_all_pages)
-    await nats_client.subscribe("processing_data", cb=handle_processing_data)
-    await nats_client.subscribe("save_to_data_lake", cb=handle_save_to_data_lake)
-    await nats_client.subscribe("get_staging_from_date", cb=handle_get_staging_from_date)
-    await nats_client.subscribe("total_amount_month", cb=handle_total_amount_month)
+    await publish_reply(msg, res)
+
+SUBJECT_HANDLERS = {
+    "test_nats": handle_test_nats,
+    "get_all_pages": handle_get_all_pages,
+    "processing_data": handle_processing_data,
+    "resume_processing": handle_resume_processing,
+    "save_to_data_lake": handle_save_to_data_lake,
+    "save_to_data_lake_batch": handle_save_to_data_lake_batch,
+    "get_staging_from_date": handle_get_staging_from_date,
+    "total_amount_month": handle_total_amount_month,
+    "cache_stats": handle_cache_stats,
+    "db_pool_stats": handle_db_pool_stats,
+    "metrics": handle_metrics,
+}
+
+# Escucha de los mensajes de NATS. Cada subject pasa por el dispatcher, que limita
+# los mensajes en curso por subject para que uno lento no bloquee al resto.
+# Todas las réplicas se suscriben en el mismo queue group, así NATS entrega cada
+# mensaje a una sola de ellas. 'subjects' permite dedicar un worker a algunos subjects.
+async def listen_to_nats(subjects=None):
+    for subject, handler in SUBJECT_HANDLERS.items():
+        if subjects and subject not in subjects:
+            continue
+        await nats_client.subscribe(subject, queue=NATS_QUEUE_GROUP, cb=dispatcher.handler(subject, handler))
 
 # Manejo de eventos de inicio y cierre de la aplicación
 app.add_event_handler("startup", connect_nats)
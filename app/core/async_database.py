@@ -0,0 +1,58 @@
+from contextlib import asynccontextmanager
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from app.config.settings import (
+    DATABASE_ASYNC_URL,
+    DATABASE_URL,
+    DB_MAX_OVERFLOW,
+    DB_POOL_PRE_PING,
+    DB_POOL_RECYCLE,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+)
+from app.core.metrics import instrument_engine
+
+# Engine asíncrono para los subjects de lectura (DB_READ_MODE=async). Requiere asyncpg y
+# se crea la primera vez que se usa, dentro del event loop que lo va a usar.
+_engine = None
+_session_factory = None
+
+
+def async_database_url():
+    if DATABASE_ASYNC_URL:
+        return DATABASE_ASYNC_URL
+    url = make_url(DATABASE_URL)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def get_async_engine():
+    global _engine, _session_factory
+    if _engine is None:
+        _engine = create_async_engine(
+            async_database_url(),
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_pre_ping=DB_POOL_PRE_PING,
+        )
+        instrument_engine(_engine.sync_engine)
+        _session_factory = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+    return _engine
+
+
+@asynccontextmanager
+async def async_session_scope():
+    get_async_engine()
+    async with _session_factory() as db:
+        yield db
+
+
+async def dispose_async_engine():
+    global _engine, _session_factory
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _session_factory = None
@@ -0,0 +1,109 @@
+import threading
+import time
+from collections import OrderedDict
+from app.config.settings import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+from app.domain.models.page_model import as_date
+
+
+# LRU con TTL, seguro entre hilos. Guarda las respuestas ya serializadas de las lecturas.
+# Es local al proceso: las escrituras de otras réplicas se ven al vencer el TTL (ver README).
+class TTLCache:
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # Cambia con cada invalidación; un valor leído antes de una invalidación no se guarda
+        self._version = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def version(self):
+        return self._version
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, version=None):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            if version is not None and version != self._version:
+                return
+
+            self._data[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, predicate):
+        with self._lock:
+            self._version += 1
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+                self.invalidations += 1
+
+    def clear(self):
+        self.invalidate(lambda key: True)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+reply_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+
+# Claves de las lecturas cacheadas
+def all_pages_key():
+    return ("get_all_pages",)
+
+def staging_from_date_key(date):
+    return ("get_staging_from_date", as_date(date))
+
+def total_amount_month_key(year, month):
+    return ("total_amount_month", year, month)
+
+
+# Invalida las lecturas afectadas por un cambio en los registros de una fecha.
+# Las entradas se guardan como (clave, formato de respuesta).
+def invalidate_date(date):
+    date = as_date(date)
+    affected = {
+        all_pages_key(),
+        staging_from_date_key(date),
+        total_amount_month_key(date.year, date.month),
+    }
+    reply_cache.invalidate(lambda key: key[0] in affected)
@@ -0,0 +1,243 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+# Métricas en memoria, por proceso, expuestas en formato de texto de Prometheus
+# (GET /metrics en la API y el subject 'metrics' de NATS). Lo que se mide en los procesos
+# hijos (PROCESSING_WORKERS > 1, NATS_PROCESS_SUBJECTS) queda en esos procesos.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = None
+
+    def __init__(self, name: str, description: str, labels: tuple = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels[name] for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.type}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.labels, key)} {value}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                # [conteo por bucket (el último es +Inf), suma]
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    # {valores de las etiquetas: (conteo, suma)}
+    def totals(self):
+        with self._lock:
+            return {key: (sum(counts), total) for key, (counts, total) in self._values.items()}
+
+    def _render_value(self, key, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            labels = _format_labels(self.labels, key, f'le="{bound}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labels, key)
+        lines.append(f"{self.name}_sum{labels} {total}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, description, labels=()):
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name, description, labels=()):
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Handlers de NATS
+NATS_MESSAGES = registry.counter(
+    "nats_messages_total", "Mensajes de NATS atendidos por subject y resultado", ("subject", "result"))
+NATS_HANDLER_SECONDS = registry.histogram(
+    "nats_handler_seconds", "Duración de los handlers de NATS", ("subject",))
+NATS_IN_FLIGHT = registry.gauge(
+    "nats_in_flight", "Mensajes de NATS en curso por subject", ("subject",))
+
+# Base de datos
+DB_QUERY_SECONDS = registry.histogram(
+    "db_query_seconds", "Duración de las consultas SQL por operación", ("operation",))
+DB_QUERY_ERRORS = registry.counter(
+    "db_query_errors_total", "Consultas SQL con error por operación", ("operation",))
+DB_BATCH_COMMITS = registry.histogram(
+    "db_batch_commits", "Commits de la sesión por lote de trabajo", ("operation",),
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+
+# Descargas de save_to_data_lake
+HTTP_FETCH_SECONDS = registry.histogram(
+    "http_fetch_seconds", "Duración de la transferencia de las descargas de las APIs de origen", ("host",))
+HTTP_FETCH_BYTES = registry.counter(
+    "http_fetch_bytes_total", "Bytes descargados de las APIs de origen", ("host",))
+HTTP_FETCHES = registry.counter(
+    "http_fetches_total", "Descargas de las APIs de origen por resultado", ("host", "result"))
+
+# processing_file
+PROCESSING_STAGE_SECONDS = registry.histogram(
+    "processing_stage_seconds", "Duración de cada etapa de processing_file, por chunk", ("stage",))
+PROCESSING_FILE_SECONDS = registry.histogram(
+    "processing_file_seconds", "Duración de processing_file por archivo")
+PROCESSING_ROWS = registry.counter(
+    "processing_rows_total", "Filas leídas y filas cargadas por processing_file", ("stage",))
+PROCESSING_ROWS_PER_SECOND = registry.gauge(
+    "processing_rows_per_second", "Filas cargadas por segundo en el último archivo procesado")
+
+
+# Scheduler de la API
+SCHEDULER_RECORDS = registry.counter(
+    "scheduler_records_total", "Registros procesados por el scheduler por estado final", ("status",))
+SCHEDULER_IN_FLIGHT = registry.gauge(
+    "scheduler_in_flight", "Trabajos del scheduler en curso")
+
+# Mide el tiempo de cada next() de un iterador (p. ej. la lectura de cada chunk)
+def timed_iter(iterable, histogram, **labels):
+    iterator = iter(iterable)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        histogram.observe(time.perf_counter() - started, **labels)
+        yield item
+
+
+_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "COPY"}
+
+
+def _operation(statement):
+    words = statement.lstrip().split(None, 1)
+    operation = words[0].upper() if words else ""
+    return operation if operation in _OPERATIONS else "OTHER"
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_query_start"].pop()
+    DB_QUERY_SECONDS.observe(time.perf_counter() - started, operation=_operation(statement))
+
+
+def _handle_error(context):
+    starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+    DB_QUERY_ERRORS.inc(operation=_operation(context.statement or ""))
+
+
+# Registra la duración de cada consulta de un engine (sync, o el sync_engine de uno asíncrono)
+def instrument_engine(engine):
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import io
+import os
+import uuid
+from contextlib import contextmanager
+from app.config.settings import DATA_LAKE_COMPRESSION, DATA_LAKE_DIR, DATA_LAKE_PROCESSED_DIR
+
+# zstandard es opcional: solo hace falta con DATA_LAKE_COMPRESSION=zstd o para leer .zst
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Sufijo de cada compresión; los lectores (pandas, pyarrow, open_text) la detectan por él
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+# Formatos que ya vienen comprimidos y se guardan tal cual
+_COMPRESSED_FORMATS = ("xlsx", "xls", "parquet")
+
+
+# Extensión del contenido, sin el sufijo de compresión ("a.csv.gz" -> "a.csv")
+def strip_compression(path):
+    for suffix in COMPRESSION_SUFFIXES.values():
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return path
+
+
+# Abre un archivo en modo texto, comprimiendo o descomprimiendo según su sufijo
+def open_text(path, mode : str = "r", newline : str = None):
+    return io.TextIOWrapper(_open_binary(path, mode), encoding="utf-8", newline=newline)
+
+
+def _open_binary(path, mode):
+    if path.endswith(COMPRESSION_SUFFIXES["gzip"]):
+        return gzip.open(path, mode + "b", compresslevel=6)
+    if path.endswith(COMPRESSION_SUFFIXES["zstd"]):
+        if zstandard is None:
+            raise ImportError("Los archivos .zst requieren zstandard (pip install zstandard)")
+        if mode == "w":
+            return zstandard.ZstdCompressor().stream_writer(open(path, "wb"), closefd=True)
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, mode + "b")
+
+
+class _ContentWriter(io.RawIOBase):
+    # Calcula el hash y el tamaño del contenido sin comprimir mientras se escribe
+    def __init__(self, stream):
+        self.stream = stream
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.hash.update(data)
+        self.size += len(data)
+        self.stream.write(data)
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.stream.close()
+        super().close()
+
+
+class StoredFile:
+    def __init__(self):
+        self.file = None
+        self.path = None
+        self.size = 0
+        self.content_hash = None
+
+
+# Data lake en disco local, particionado por plataforma y fecha:
+#   <root>/platform=<id>/date=<YYYY-MM-DD>/<sha256>.<ext>[.gz|.zst]
+# El nombre es el hash del contenido sin comprimir, así una descarga idéntica reutiliza el
+# archivo existente. Las rutas que se guardan en la base son relativas a la raíz, y las
+# anteriores a este esquema (archivos sueltos en la raíz) se siguen resolviendo igual.
+class DataLakeStorage:
+    def __init__(self, root : str, compression : str = "none"):
+        if compression not in ("none", *COMPRESSION_SUFFIXES):
+            raise ValueError(f"Compresión no soportada: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("DATA_LAKE_COMPRESSION=zstd requiere zstandard (pip install zstandard)")
+        self.root = root
+        self.compression = compression
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, relative_path):
+        return os.path.join(self.root, relative_path)
+
+    def exists(self, relative_path):
+        return os.path.exists(self.path(relative_path))
+
+    def partition(self, platform_id, date):
+        # date puede ser un date o un texto "YYYY-MM-DD"
+        return os.path.join(f"platform={platform_id}", f"date={date}")
+
+    # Escribe un archivo nuevo en la partición. Dentro del bloque se escribe en
+    # stored.file (texto, o binario con binary=True); al salir queda stored.path con la
+    # ruta relativa final. Si falla, no queda nada escrito.
+    @contextmanager
+    def writer(self, platform_id, date, extension, binary : bool = False):
+        partition = self.partition(platform_id, date)
+        os.makedirs(self.path(partition), exist_ok=True)
+
+        suffix = self._suffix(extension)
+        temp_path = self.temp_path(os.path.join(partition, f"tmp{suffix}"))
+        content = _ContentWriter(_open_binary(temp_path, "w"))
+        stored = StoredFile()
+        stored.file = content if binary else io.TextIOWrapper(content, encoding="utf-8", newline="")
+        try:
+            yield stored
+            stored.file.close()
+        except BaseException:
+            stored.file.close()
+            os.remove(temp_path)
+            raise
+
+        stored.content_hash = content.hash.hexdigest()
+        stored.path = os.path.join(partition, f"{stored.content_hash}.{extension}{suffix}")
+        stored.size = content.size
+        self.commit(temp_path, stored.path)
+
+    # Copia un flujo de bytes (p. ej. el cuerpo de una respuesta HTTP) al data lake
+    def save_chunks(self, chunks, platform_id, date, extension):
+        with self.writer(platform_id, date, extension, binary=True) as stored:
+            for chunk in chunks:
+                stored.file.write(chunk)
+        return stored
+
+    # Ruta absoluta fija (sin comprimir) para un archivo que se escribe en varias etapas y se
+    # retoma si el proceso se cae; se publica con store_file al terminarlo
+    def partial_path(self, platform_id, date, name):
+        partition = self.partition(platform_id, date)
+        os.makedirs(self.path(partition), exist_ok=True)
+        return self.path(os.path.join(partition, f".{name}.partial"))
+
+    # Copia un archivo local al data lake (comprimido y nombrado por su contenido)
+    def store_file(self, local_path, platform_id, date, extension):
+        with open(local_path, "rb") as source:
+            return self.save_chunks(iter(lambda: source.read(1024 * 1024), b""), platform_id, date, extension)
+
+    # Ruta relativa de un archivo derivado de otro (p. ej. el sidecar de un .xlsx), en la
+    # misma partición y con el mismo hash
+    def derived_path(self, relative_path, extension):
+        base = os.path.splitext(strip_compression(relative_path))[0]
+        return f"{base}.{extension}{self._suffix(extension)}"
+
+    # Ruta absoluta temporal para escribir relative_path (con el mismo sufijo de compresión)
+    def temp_path(self, relative_path):
+        directory, name = os.path.split(self.path(relative_path))
+        return os.path.join(directory, f".{uuid.uuid4()}.{name}")
+
+    # Publica un archivo temporal en relative_path; si ya existe (mismo contenido), se descarta
+    def commit(self, temp_path, relative_path):
+        if self.exists(relative_path):
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, self.path(relative_path))
+
+    def _suffix(self, extension):
+        if extension.rsplit(".", 1)[-1] in _COMPRESSED_FORMATS:
+            return ""
+        return COMPRESSION_SUFFIXES.get(self.compression, "")
+
+    def remove(self, relative_path):
+        if self.exists(relative_path):
+            os.remove(self.path(relative_path))
+
+
+# Archivos descargados de las APIs de origen y archivos procesados
+raw_storage = DataLakeStorage(DATA_LAKE_DIR, DATA_LAKE_COMPRESSION)
+processed_storage = DataLakeStorage(DATA_LAKE_PROCESSED_DIR, DATA_LAKE_COMPRESSION)
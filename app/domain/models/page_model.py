@@ -1,9 +1,16 @@
+from datetime import date as date_type
 from enum import Enum
-from sqlalchemy import Column, ForeignKey, Integer, String, Enum as SQLAlchemyEnum, DateTime
+from sqlalchemy import BigInteger, Column, Date, ForeignKey, Index, Integer, Numeric, String, UniqueConstraint, Enum as SQLAlchemyEnum, DateTime
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from app.core.database import Base
 
+# Las fechas llegan como texto 'YYYY-MM-DD' desde NATS y la API
+def as_date(value):
+    if isinstance(value, str):
+        return date_type.fromisoformat(value)
+    return value
+
 class StatusEnum(str, Enum):
     PENDING = "pending"
     PROCESSING = "processing"
@@ -13,11 +20,29 @@ class StatusEnum(str, Enum):
 
 class PageStagingData(Base):
     __tablename__ = "page_staging_data"
+    __table_args__ = (
+        # Un solo archivo por plataforma y fecha; también sirve a exists_in_date
+        UniqueConstraint("platform_id", "date", name="uq_page_staging_data_platform_id_date"),
+        # get_all_pending (date, status) y get_staging_from_date (date)
+        Index("ix_page_staging_data_date_status", "date", "status"),
+        # get_completed_by_fingerprint (platform_id, fingerprint)
+        Index("ix_page_staging_data_platform_id_fingerprint", "platform_id", "fingerprint"),
+        # get_stale_processing (status, heartbeat_at)
+        Index("ix_page_staging_data_status_heartbeat_at", "status", "heartbeat_at"),
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     file_path = Column(String, nullable=False)
+    # Copia del .xlsx en CSV o Parquet, creada al descargarlo; processing_file la lee en su lugar
+    file_path_sidecar = Column(String, nullable=True)
     file_path_processed = Column(String, nullable=True)
-    date = Column(String, nullable=False)
+    # Hash del contenido y de las columnas del archivo, calculado al descargarlo
+    fingerprint = Column(String(64), nullable=True)
+    # Última señal del proceso que lo está procesando; si vence, otro proceso lo retoma
+    heartbeat_at = Column(DateTime, nullable=True)
+    # Lease del proceso que lo tomó (claim_pending, claim_stale); solo ese proceso lo confirma
+    lease_token = Column(String(36), nullable=True)
+    date = Column(Date, nullable=False)
     platform_id = Column(Integer, nullable=False)
     status = Column(SQLAlchemyEnum(StatusEnum), nullable=False, default=StatusEnum.PENDING)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
@@ -26,10 +51,14 @@ class PageStagingData(Base):
     logs = relationship("PageStagingLog", back_populates="staging_data")
     processed_data = relationship("PageProcessedData", back_populates="staging_data")
 
+    @validates("date")
+    def validate_date(self, key, value):
+        return as_date(value)
+
     def to_dict(self):
         return {
             "id": self.id,
-            "date": self.date,
+            "date": self.date.isoformat() if self.date else None,
             "platform_id": self.platform_id,
             "status": self.status,
         }
@@ -37,8 +66,8 @@ class PageStagingData(Base):
 class PageStagingLog(Base):
     __tablename__ = "page_staging_log"
 
-    id = Column(Integer, primary_key=True, index=True)
-    staging_data_id = Column(Integer, ForeignKey("page_staging_data.id"), nullable=False)
+    id = Column(Integer, primary_key=True)
+    staging_data_id = Column(Integer, ForeignKey("page_staging_data.id"), nullable=False, index=True)
     error_description = Column(String, nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
@@ -49,11 +78,42 @@ class PageStagingLog(Base):
 class PageProcessedData(Base):
     __tablename__ = "page_processed_data"
 
-    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    staging_data_id = Column(Integer, ForeignKey("page_staging_data.id"), nullable=False)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    staging_data_id = Column(Integer, ForeignKey("page_staging_data.id"), nullable=False, index=True)
     model_name = Column(String, nullable=False)
-    amount = Column(String, nullable=False)
+    amount = Column(Numeric, nullable=False)
     created_at = Column(DateTime, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
 
     staging_data = relationship("PageStagingData", back_populates="processed_data")
+
+
+# Total y cantidad de filas procesadas por plataforma, día y modelo. Se actualiza en la
+# misma transacción que inserta page_processed_data (ver PageRollupRepository).
+class PageAmountRollup(Base):
+    __tablename__ = "page_amount_rollup"
+    __table_args__ = (
+        Index("ix_page_amount_rollup_day", "day"),
+    )
+
+    platform_id = Column(Integer, primary_key=True)
+    day = Column(Date, primary_key=True)
+    model_name = Column(String, primary_key=True)
+    total_amount = Column(Numeric, nullable=False, default=0)
+    row_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+# Avance de processing_file por chunk. Cada fila se confirma en la misma transacción que las
+# filas procesadas del chunk, así un proceso que se cae se retoma desde el último chunk.
+class PageProcessingCheckpoint(Base):
+    __tablename__ = "page_processing_checkpoint"
+
+    staging_data_id = Column(Integer, ForeignKey("page_staging_data.id"), primary_key=True)
+    chunk_index = Column(Integer, primary_key=True)
+    # Acumulados hasta este chunk (inclusive): filas leídas del archivo, filas insertadas y
+    # bytes escritos en el CSV procesado parcial
+    rows_read = Column(BigInteger, nullable=False)
+    rows_inserted = Column(BigInteger, nullable=False)
+    output_offset = Column(BigInteger, nullable=False)
+    created_at = Column(DateTime, server_default=func.now(), nullable=False)
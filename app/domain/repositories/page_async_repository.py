@@ -0,0 +1,50 @@
+from datetime import date as date_type
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.models.page_model import PageAmountRollup, PageStagingData, as_date
+
+
+# Variantes asíncronas de las lecturas de PageRepository y PageRollupRepository,
+# para los subjects de lectura con DB_READ_MODE=async. Las escrituras siguen en el engine sync.
+class AsyncPageRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    # Recorre todos los registros con un cursor del servidor, por lotes de batch_size
+    async def iter_all(self, batch_size : int):
+        query = select(PageStagingData).order_by(PageStagingData.id).execution_options(yield_per=batch_size)
+        result = await self.db.stream_scalars(query)
+        async for record in result:
+            yield record
+
+    # Paginación por keyset sobre 'id': registros con id > after_id, en orden
+    async def get_page(self, after_id : int = None, limit : int = 100):
+        query = select(PageStagingData)
+        if after_id is not None:
+            query = query.filter(PageStagingData.id > after_id)
+        result = await self.db.scalars(query.order_by(PageStagingData.id).limit(limit))
+        return result.all()
+
+    async def get_staging_from_date(self, date : str):
+        result = await self.db.scalars(select(PageStagingData).filter(
+            PageStagingData.date == as_date(date),
+        ))
+        return result.all()
+
+
+class AsyncPageRollupRepository:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def total_amount_month(self, year, month):
+        start = date_type(year, month, 1)
+        end = date_type(year + month // 12, month % 12 + 1, 1)
+
+        total_amount = await self.db.scalar(select(func.sum(PageAmountRollup.total_amount)).filter(
+            and_(
+                PageAmountRollup.day >= start,
+                PageAmountRollup.day < end,
+            )
+        ))
+
+        return total_amount or 0
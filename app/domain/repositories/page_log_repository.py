@@ -19,6 +19,17 @@ class PageLogRepository:
             self.db.rollback()
             raise HTTPException(status_code=400, detail=str(e))
 
+    def create_many(self, rows : list, commit : bool = True):
+        try:
+            logs = [PageStagingLog(**row) for row in rows]
+            self.db.add_all(logs)
+            if commit:
+                self.db.commit()
+            return logs
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+
     def get_one(self, id: int):
         return self.db.query(PageStagingLog).filter(PageStagingLog.id == id).first()
 
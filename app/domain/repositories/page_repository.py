@@ -1,10 +1,22 @@
+import io
+import uuid
+from datetime import datetime
 from fastapi import HTTPException
-from sqlalchemy import Numeric, and_, cast, func
+from sqlalchemy import String, and_, insert, literal, or_, select, tuple_, update
 from sqlalchemy.orm import Session
-from app.domain.models.page_model import PageStagingData, PageProcessedData
-from sqlalchemy.exc import SQLAlchemyError
+from app.domain.models.page_model import PageProcessingCheckpoint, PageStagingData, PageProcessedData, as_date
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import pandas as pd
 from app.core.database import engine
+from app.config.settings import BULK_INSERT_CHUNK_SIZE
+from app.core.cache import invalidate_date
+from app.domain.repositories.page_rollup_repository import UPSERT_INSERTS
+
+
+# El registro ya no está en 'processing' con el lease de quien llama: otro proceso lo tomó
+# (p. ej. lo retomó resume_processing porque venció su heartbeat) o ya lo terminó
+class LeaseLostError(Exception):
+    pass
 
 
 class PageRepository:
@@ -18,7 +30,47 @@ class PageRepository:
             self.db.add(db_page)
             self.db.commit()
             self.db.refresh(db_page)
+            invalidate_date(db_page.date)
             return db_page
+        except IntegrityError:
+            # uq_page_staging_data_platform_id_date: otra réplica ya creó el registro
+            self.db.rollback()
+            raise ValueError("This record already exist")
+        except SQLAlchemyError as e:
+            self.db.rollback()
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Crea varios registros; los (platform_id, date) que ya existen se omiten.
+    # Retorna {(platform_id, date): registro} con los creados.
+    def create_many(self, rows : list, commit : bool = True):
+        rows = [{**row, "date": as_date(row["date"])} for row in rows]
+        created = {}
+        if not rows:
+            return created
+
+        upsert = UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+        try:
+            if upsert is not None:
+                stmt = upsert(PageStagingData).on_conflict_do_nothing(
+                    index_elements=["platform_id", "date"]
+                ).returning(PageStagingData)
+                for record in self.db.scalars(stmt, rows):
+                    created[(record.platform_id, record.date)] = record
+            else:
+                for row in rows:
+                    try:
+                        with self.db.begin_nested():
+                            record = PageStagingData(**row)
+                            self.db.add(record)
+                        created[(record.platform_id, record.date)] = record
+                    except IntegrityError:
+                        continue
+
+            if commit:
+                self.db.commit()
+            for platform_id, date in created:
+                invalidate_date(date)
+            return created
         except SQLAlchemyError as e:
             self.db.rollback()
             raise HTTPException(status_code=400, detail=str(e))
@@ -28,31 +80,242 @@ class PageRepository:
 
     def get_all(self):
         return self.db.query(PageStagingData).all()
+
+    # Recorre todos los registros con un cursor del servidor, construyendo los objetos por lotes
+    def iter_all(self, batch_size : int):
+        return self.db.query(PageStagingData).order_by(PageStagingData.id).yield_per(batch_size)
+
+    # Paginación por keyset sobre 'id': registros con id > after_id, en orden
+    def get_page(self, after_id : int = None, limit : int = 100):
+        query = self.db.query(PageStagingData)
+        if after_id is not None:
+            query = query.filter(PageStagingData.id > after_id)
+        return query.order_by(PageStagingData.id).limit(limit).all()
     
     def exists_in_date(self, platform_id: int, date : str):
         return self.db.query(PageStagingData).filter(and_(
-            PageStagingData.date == date,
+            PageStagingData.date == as_date(date),
             PageStagingData.platform_id == platform_id
         )).first()
     
+    # Retorna el conjunto de (platform_id, date) que ya tienen registro
+    def existing_pairs(self, pairs : list):
+        pairs = {(platform_id, as_date(date)) for platform_id, date in pairs}
+        if not pairs:
+            return set()
+
+        rows = self.db.query(PageStagingData.platform_id, PageStagingData.date).filter(
+            tuple_(PageStagingData.platform_id, PageStagingData.date).in_(list(pairs))
+        ).all()
+        return {(platform_id, date) for platform_id, date in rows}
+
+    # Indica si algún registro usa el archivo del data lake (como archivo o como sidecar)
+    def file_in_use(self, file_path : str):
+        return self.db.query(PageStagingData.id).filter(or_(
+            PageStagingData.file_path == file_path,
+            PageStagingData.file_path_sidecar == file_path
+        )).first() is not None
+
+    # Último registro completado de la plataforma con la misma huella (otro que exclude_id)
+    def get_completed_by_fingerprint(self, platform_id : int, fingerprint : str, exclude_id : int):
+        return self.db.query(PageStagingData).filter(and_(
+            PageStagingData.platform_id == platform_id,
+            PageStagingData.fingerprint == fingerprint,
+            PageStagingData.status == "completed",
+            PageStagingData.id != exclude_id
+        )).order_by(PageStagingData.id.desc()).first()
+
+    # Registros en 'processing' cuyo heartbeat venció (o que nunca tuvieron uno)
+    def get_stale_processing(self, stale_before : datetime, date : str = None):
+        query = self.db.query(PageStagingData).filter(and_(
+            PageStagingData.status == "processing",
+            or_(PageStagingData.heartbeat_at.is_(None), PageStagingData.heartbeat_at < stale_before)
+        ))
+        if date is not None:
+            query = query.filter(PageStagingData.date == as_date(date))
+        return query.order_by(PageStagingData.id).all()
+
+    # Toma un registro abandonado con un lease nuevo y renueva su heartbeat, solo si sigue
+    # vencido: de dos procesos que lo intentan a la vez, uno solo lo consigue. Retorna el
+    # lease, o None si no se pudo tomar.
+    def claim_stale(self, id : int, stale_before : datetime):
+        lease_token = str(uuid.uuid4())
+        claimed = self.db.query(PageStagingData).filter(and_(
+            PageStagingData.id == id,
+            PageStagingData.status == "processing",
+            or_(PageStagingData.heartbeat_at.is_(None), PageStagingData.heartbeat_at < stale_before)
+        )).update({"heartbeat_at": datetime.now(), "lease_token": lease_token}, synchronize_session=False)
+        self.db.commit()
+        return lease_token if claimed == 1 else None
+
+    # Renueva el heartbeat de los registros que siguen en 'processing' con el lease dado.
+    # Retorna sus ids: los que faltan los tomó otro proceso o ya no están en 'processing'.
+    def renew_lease(self, ids : list, lease_token : str):
+        owned = self.db.query(PageStagingData).filter(and_(
+            PageStagingData.id.in_(ids),
+            PageStagingData.status == "processing",
+            PageStagingData.lease_token == lease_token
+        ))
+        owned.update({"heartbeat_at": datetime.now()}, synchronize_session=False)
+        renewed = [id for id, in owned.with_entities(PageStagingData.id)]
+        self.db.commit()
+        return renewed
+
+    def _owned(self, id : int, lease_token : str):
+        return self.db.query(PageStagingData).filter(and_(
+            PageStagingData.id == id,
+            PageStagingData.status == "processing",
+            PageStagingData.lease_token == lease_token
+        ))
+
+    def last_checkpoint(self, staging_data_id : int):
+        return self.db.query(PageProcessingCheckpoint).filter(
+            PageProcessingCheckpoint.staging_data_id == staging_data_id
+        ).order_by(PageProcessingCheckpoint.chunk_index.desc()).first()
+
+    # Confirma las filas del chunk junto con su checkpoint y renueva el heartbeat. Si el
+    # registro ya no tiene el lease, o el chunk ya estaba confirmado, otro proceso tomó el
+    # archivo: no se confirma nada.
+    def save_checkpoint(self, staging_data_id : int, lease_token : str, chunk_index : int, rows_read : int,
+                        rows_inserted : int, output_offset : int):
+        try:
+            self.db.add(PageProcessingCheckpoint(
+                staging_data_id=staging_data_id, chunk_index=chunk_index, rows_read=rows_read,
+                rows_inserted=rows_inserted, output_offset=output_offset,
+            ))
+            owned = self._owned(staging_data_id, lease_token).update(
+                {"heartbeat_at": datetime.now()}, synchronize_session=False)
+            if owned != 1:
+                self.db.rollback()
+                raise LeaseLostError(f"El registro {staging_data_id} ya no tiene este lease")
+            self.db.commit()
+        except IntegrityError:
+            self.db.rollback()
+            raise LeaseLostError(f"El chunk {chunk_index} del registro {staging_data_id} ya fue confirmado por otro proceso")
+
+    def delete_checkpoints(self, staging_data_id : int):
+        self.db.query(PageProcessingCheckpoint).filter(
+            PageProcessingCheckpoint.staging_data_id == staging_data_id
+        ).delete(synchronize_session=False)
+
+    # Descarta el avance de un registro (filas procesadas y checkpoints) para empezarlo de nuevo
+    def reset_progress(self, staging_data_id : int):
+        self.db.query(PageProcessedData).filter(
+            PageProcessedData.staging_data_id == staging_data_id
+        ).delete(synchronize_session=False)
+        self.delete_checkpoints(staging_data_id)
+        self.db.commit()
+
+    # Toma hasta 'limit' registros pendientes (None = todos) de la fecha, o de cualquier fecha
+    # (los más antiguos primero), y los pasa a 'processing'. Con FOR UPDATE SKIP LOCKED
+    # (PostgreSQL) cada nodo se salta las filas que otro está tomando en ese momento; el UPDATE
+    # solo cambia las que siguen en 'pending', así en un motor sin SKIP LOCKED tampoco se
+    # entregan dos veces (y si otro proceso tomó todos los candidatos, se vuelven a buscar).
+    # Los registros tomados comparten un lease nuevo (lease_token).
+    def claim_pending(self, limit : int = None, date : str = None):
+        query = select(PageStagingData.id).where(PageStagingData.status == "pending")
+        if date is not None:
+            query = query.where(PageStagingData.date == as_date(date))
+        query = query.order_by(PageStagingData.date, PageStagingData.id).limit(limit).with_for_update(skip_locked=True)
+
+        lease_token = str(uuid.uuid4())
+        claimed = 0
+        while not claimed:
+            ids = self.db.scalars(query).all()
+            if not ids:
+                self.db.commit()
+                return []
+
+            claimed = self.db.execute(update(PageStagingData).where(and_(
+                PageStagingData.id.in_(ids),
+                PageStagingData.status == "pending"
+            )).values(status="processing", heartbeat_at=datetime.now(), lease_token=lease_token)).rowcount
+            self.db.commit()
+
+        records = self.db.query(PageStagingData).filter(and_(
+            PageStagingData.id.in_(ids),
+            PageStagingData.lease_token == lease_token
+        )).order_by(PageStagingData.date, PageStagingData.id).all()
+        for date in {record.date for record in records}:
+            invalidate_date(date)
+        return records
+
     def get_all_pending(self, date : str):
         return self.db.query(PageStagingData).filter(and_(
-            PageStagingData.date == date,
+            PageStagingData.date == as_date(date),
             PageStagingData.status == "pending"
         )).all()
     
     def get_staging_from_date(self, date : str):
         return self.db.query(PageStagingData).filter(and_(
-            PageStagingData.date == date,
+            PageStagingData.date == as_date(date),
         )).all()
     
-    def insert_bulk_data(self, data_dict : dict):
-        chunksize = 100
-        for i in range(0, len(data_dict), chunksize):
-            self.db.bulk_insert_mappings(PageProcessedData, data_dict[i:i+chunksize])
+    def insert_bulk_data(self, df : pd.DataFrame, commit : bool = True):
+        # Sin commit: quien llama decide cuándo confirmar (junto con el checkpoint del chunk)
+        columns = ["staging_data_id", "model_name", "amount"]
+        df = df[columns]
+
+        if not self._copy_dataframe(df, columns):
+            table = PageProcessedData.__table__
+            for i in range(0, len(df), BULK_INSERT_CHUNK_SIZE):
+                self.db.execute(insert(table), df.iloc[i:i + BULK_INSERT_CHUNK_SIZE].to_dict(orient='records'))
+
+        if commit:
             self.db.commit()
 
-        return True  
+        return True
+
+    # Copia en la base las filas procesadas de un registro a otro, sin pasar por pandas.
+    # Sin commit, como insert_bulk_data. Retorna la cantidad de filas copiadas.
+    def copy_processed_rows(self, source_id : int, target_id : int):
+        rows = select(
+            literal(target_id).label("staging_data_id"), PageProcessedData.model_name, PageProcessedData.amount
+        ).where(PageProcessedData.staging_data_id == source_id)
+        result = self.db.execute(
+            insert(PageProcessedData).from_select(["staging_data_id", "model_name", "amount"], rows)
+        )
+        return result.rowcount
+
+    # Carga con COPY FROM STDIN en PostgreSQL (psycopg2). Retorna False si no aplica.
+    def _copy_dataframe(self, df : pd.DataFrame, columns : list):
+        if self.db.get_bind().dialect.name != "postgresql":
+            return False
+
+        cursor = self.db.connection().connection.cursor()
+        try:
+            if not hasattr(cursor, "copy_expert"):
+                return False
+
+            # En CSV, COPY lee un campo vacío sin comillas como NULL; en las columnas de texto se
+            # guarda '' como el INSERT
+            table = PageProcessedData.__table__
+            text_columns = [column for column in columns if isinstance(table.c[column].type, String)]
+            options = "FORMAT csv" + (f", FORCE_NOT_NULL ({', '.join(text_columns)})" if text_columns else "")
+            copy_sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH ({options})"
+            for i in range(0, len(df), BULK_INSERT_CHUNK_SIZE):
+                buffer = io.StringIO()
+                df.iloc[i:i + BULK_INSERT_CHUNK_SIZE].to_csv(buffer, index=False, header=False)
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+        finally:
+            cursor.close()
+
+        return True
+
+    # Pasa a 'completed' un registro en proceso, en la misma transacción que lo que quedó sin
+    # confirmar (filas, rollup, checkpoints), solo si sigue teniendo el lease
+    def complete_processing(self, id : int, lease_token : str, output_path : str):
+        owned = self._owned(id, lease_token)
+        date = owned.with_entities(PageStagingData.date).scalar()
+        completed = owned.update(
+            {"status": "completed", "file_path_processed": output_path}, synchronize_session=False)
+        if completed != 1:
+            self.db.rollback()
+            raise LeaseLostError(f"El registro {id} ya no tiene este lease")
+
+        self.db.commit()
+        invalidate_date(date)
 
     def change_staging_status(self, id : int, status : str ,output_path : str = None ):
 
@@ -60,19 +323,13 @@ class PageRepository:
 
         if record:
             record.status = status
-            if output_path is None:
+            if status == "processing":
+                record.heartbeat_at = datetime.now()
+            if output_path is not None:
                 record.file_path_processed = output_path
             
             self.db.commit()
+            invalidate_date(record.date)
             return True
         else:
             return False
-
-    def total_amount_month(self, year , month):
-        total_amount = self.db.query(func.sum(cast(PageProcessedData.amount, Numeric))).filter(
-            and_(
-                PageStagingData.date.like(f"{year}-{month:02d}%")
-            )
-        ).scalar()
-
-        return total_amount or 0 
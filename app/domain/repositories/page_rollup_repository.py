@@ -0,0 +1,125 @@
+from datetime import date as date_type
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from app.domain.models.page_model import PageAmountRollup, PageProcessedData, PageStagingData, as_date
+
+# Inserts con ON CONFLICT por dialecto
+UPSERT_INSERTS = {
+    "postgresql": postgresql_insert,
+    "sqlite": sqlite_insert,
+}
+
+ROLLUP_COLUMNS = ["platform_id", "day", "model_name", "total_amount", "row_count"]
+
+# Solo cuentan los archivos terminados: uno en curso o fallido puede tener chunks confirmados
+_COMPLETED = PageStagingData.status == "completed"
+
+
+class PageRollupRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    # Agregado de page_processed_data por plataforma, día y modelo
+    def _aggregate(self, *conditions):
+        return select(
+            PageStagingData.platform_id,
+            PageStagingData.date,
+            PageProcessedData.model_name,
+            func.sum(PageProcessedData.amount),
+            func.count(),
+        ).join(
+            PageStagingData, PageProcessedData.staging_data_id == PageStagingData.id
+        ).where(
+            and_(*conditions)
+        ).group_by(
+            PageStagingData.platform_id, PageStagingData.date, PageProcessedData.model_name
+        )
+
+    # Suma al rollup las filas procesadas de un registro de staging. No hace commit:
+    # se confirma junto con la inserción de las filas.
+    def add_staging_data(self, staging_data_id : int):
+        aggregate = self._aggregate(PageProcessedData.staging_data_id == staging_data_id)
+        upsert = UPSERT_INSERTS.get(self.db.get_bind().dialect.name)
+
+        if upsert is None:
+            for platform_id, day, model_name, total, count in self.db.execute(aggregate).all():
+                row = self.db.get(PageAmountRollup, (platform_id, day, model_name))
+                if row is None:
+                    self.db.add(PageAmountRollup(platform_id=platform_id, day=day, model_name=model_name,
+                                                 total_amount=total, row_count=count))
+                else:
+                    row.total_amount += total
+                    row.row_count += count
+            self.db.flush()
+            return
+
+        stmt = upsert(PageAmountRollup).from_select(ROLLUP_COLUMNS, aggregate)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["platform_id", "day", "model_name"],
+            set_={
+                "total_amount": PageAmountRollup.total_amount + stmt.excluded.total_amount,
+                "row_count": PageAmountRollup.row_count + stmt.excluded.row_count,
+                "updated_at": func.now(),
+            },
+        )
+        self.db.execute(stmt)
+
+    def _day_range(self, column, start, end):
+        conditions = []
+        if start is not None:
+            conditions.append(column >= as_date(start))
+        if end is not None:
+            conditions.append(column <= as_date(end))
+        return conditions
+
+    # Recalcula el rollup desde page_processed_data para el rango de días (inclusive)
+    def rebuild(self, start=None, end=None):
+        self.db.execute(delete(PageAmountRollup).where(
+            and_(True, *self._day_range(PageAmountRollup.day, start, end))
+        ))
+        aggregate = self._aggregate(_COMPLETED, *self._day_range(PageStagingData.date, start, end))
+        self.db.execute(insert(PageAmountRollup).from_select(ROLLUP_COLUMNS, aggregate))
+        self.db.commit()
+
+    # Compara el rollup con page_processed_data. Retorna las claves que no coinciden con
+    # (total, cantidad) de cada lado; None si la clave falta en uno de los dos.
+    def check_consistency(self, start=None, end=None):
+        raw = {
+            (platform_id, day, model_name): (total, count)
+            for platform_id, day, model_name, total, count in self.db.execute(
+                self._aggregate(_COMPLETED, *self._day_range(PageStagingData.date, start, end))
+            ).all()
+        }
+        rollup = {
+            (row.platform_id, row.day, row.model_name): (row.total_amount, row.row_count)
+            for row in self.db.query(PageAmountRollup).filter(
+                and_(True, *self._day_range(PageAmountRollup.day, start, end))
+            )
+        }
+
+        mismatches = []
+        for key in sorted(raw.keys() | rollup.keys()):
+            if raw.get(key) != rollup.get(key):
+                mismatches.append({
+                    "platform_id": key[0],
+                    "day": key[1].isoformat(),
+                    "model_name": key[2],
+                    "raw": raw.get(key),
+                    "rollup": rollup.get(key),
+                })
+        return mismatches
+
+    def total_amount_month(self, year, month):
+        start = date_type(year, month, 1)
+        end = date_type(year + month // 12, month % 12 + 1, 1)
+
+        total_amount = self.db.query(func.sum(PageAmountRollup.total_amount)).filter(
+            and_(
+                PageAmountRollup.day >= start,
+                PageAmountRollup.day < end,
+            )
+        ).scalar()
+
+        return total_amount or 0
@@ -0,0 +1,71 @@
+from sqlalchemy import event, insert, update
+from sqlalchemy.orm import Session
+from app.core.cache import invalidate_date
+from app.core.metrics import DB_BATCH_COMMITS
+from app.domain.models.page_model import PageStagingData, PageStagingLog
+
+
+# Acumula los cambios de estado y los logs de error de un lote (p. ej. processing_data) y
+# los confirma juntos en flush: un UPDATE por estado y un INSERT con todos los logs, en una
+# sola transacción. Los UPDATE solo cambian los registros que siguen en 'processing' con el
+# lease con el que se procesaron: si otro proceso ya tomó o terminó uno, no se pisa su
+# estado. Al salir del bloque hace flush y registra en db_batch_commits los commits que hizo
+# la sesión mientras estuvo abierto (con operation vacío no se registra).
+class PageUnitOfWork:
+    def __init__(self, db: Session, operation : str = None):
+        self.db = db
+        self.operation = operation
+        # {(estado, lease): {id: fecha}}; la fecha es para invalidar la caché
+        self.statuses = {}
+        self.logs = []
+        self.commits = 0
+
+    def __enter__(self):
+        event.listen(self.db, "after_commit", self._count_commit)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            event.remove(self.db, "after_commit", self._count_commit)
+            if self.operation:
+                DB_BATCH_COMMITS.observe(self.commits, operation=self.operation)
+        return False
+
+    def _count_commit(self, session):
+        self.commits += 1
+
+    # Si un registro cambia dos veces antes del flush, queda el último estado
+    def change_status(self, record : PageStagingData, status : str, lease_token : str):
+        for records in self.statuses.values():
+            records.pop(record.id, None)
+        self.statuses.setdefault((status, lease_token), {})[record.id] = record.date
+
+    def add_log(self, staging_data_id : int, error : str):
+        self.logs.append({"staging_data_id": staging_data_id, "error_description": error})
+
+    def flush(self):
+        if not any(self.statuses.values()) and not self.logs:
+            return
+
+        dates = set()
+        for (status, lease_token), records in self.statuses.items():
+            if not records:
+                continue
+            self.db.execute(update(PageStagingData).where(
+                PageStagingData.id.in_(list(records)),
+                PageStagingData.status == "processing",
+                PageStagingData.lease_token == lease_token
+            ).values(status=status))
+            dates.update(records.values())
+
+        if self.logs:
+            self.db.execute(insert(PageStagingLog), self.logs)
+
+        self.db.commit()
+        for date in dates:
+            invalidate_date(date)
+        self.statuses = {}
+        self.logs = []
@@ -1,4 +1,5 @@
-from datetime import datetime
+from datetime import date as date_type, datetime
+from typing import Optional
 from enum import Enum
 from pydantic import BaseModel
 
@@ -11,7 +12,7 @@ class StagingDataStatusEnum(str, Enum):
 
 class StagingDataSchema(BaseModel):
     file_path: str
-    date: str
+    date: date_type
     status: StagingDataStatusEnum
 
 class SaveToDataLakeSchema(BaseModel):
@@ -23,6 +24,8 @@ class ProcessingDataSchema(BaseModel):
 
 class StagingDataResponseSchema(StagingDataSchema):
     id: int
+    file_path_sidecar: Optional[str] = None
+    fingerprint: Optional[str] = None
     created_at: datetime
     updated_at: datetime
 
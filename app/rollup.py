@@ -0,0 +1,38 @@
+import argparse
+import json
+import sys
+from app.core.database import SessionLocal
+from app.domain.repositories.page_rollup_repository import PageRollupRepository
+
+# Mantenimiento de page_amount_rollup:
+#   python -m app.rollup rebuild [--from 2025-01-01] [--to 2025-01-31]
+#   python -m app.rollup check [--from 2025-01-01] [--to 2025-01-31]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rollup de montos por plataforma, día y modelo")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--from", dest="start", help="Primer día (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--to", dest="end", help="Último día (YYYY-MM-DD, inclusive)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rollup = PageRollupRepository(db)
+        if args.command == "rebuild":
+            rollup.rebuild(args.start, args.end)
+            print("Rollup reconstruido")
+            return
+
+        mismatches = rollup.check_consistency(args.start, args.end)
+        for mismatch in mismatches:
+            print(json.dumps(mismatch, default=str))
+        print(f"{len(mismatches)} diferencias")
+        if mismatches:
+            sys.exit(1)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
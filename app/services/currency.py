@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# Separador de miles y separador decimal de cada locale
+LOCALES = {
+    "us": (",", "."),   # 1,234.50
+    "eu": (".", ","),   # 1.234,50
+}
+
+# Códigos de moneda que se quitan antes de convertir ("US$" antes que "$")
+CURRENCY_CODES = ("USD", "US$", "EUR")
+# Caracteres que se ignoran en cualquier posición, además del separador de miles
+IGNORED_CHARS = ("$", "€", " ", "\u00a0")
+
+# Dígitos que entran exactos en la mantisa de un float64; los montos más largos se
+# convierten uno por uno
+_MAX_DIGITS = 15
+_POW10 = 10 ** np.arange(_MAX_DIGITS + 1, dtype=np.int64)
+
+# Filas por bloque y largo máximo de un monto (acotan la matriz de caracteres en memoria)
+_BLOCK_ROWS = 65536
+_MAX_CHARS = 64
+
+
+# Convierte montos en texto a float64 sin regex fila por fila: los códigos de moneda se
+# quitan con kernels de cadenas de NumPy (np.strings) y el resto se resuelve sobre la matriz
+# de code points. Acepta símbolo o código de moneda ($, US$, USD, €, EUR), separador de
+# miles, negativos con '-' o entre paréntesis y el separador decimal del locale.
+# Retorna (montos, rechazados): los rechazados (vacíos o no numéricos) quedan en NaN.
+def parse_amounts(values, locale : str = "us"):
+    if locale not in LOCALES:
+        raise ValueError(f"Locale de montos no soportado: {locale}")
+    thousands, decimal = LOCALES[locale]
+
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        amounts = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        return amounts, np.isnan(amounts)
+
+    ignored = np.array([ord(char) for char in IGNORED_CHARS + (thousands,)], dtype=np.uint32)
+    values = series.to_numpy(dtype=object)
+    amounts = np.full(len(values), np.nan)
+    for start in range(0, len(values), _BLOCK_ROWS):
+        block = slice(start, start + _BLOCK_ROWS)
+        amounts[block] = _parse_values(values[block], ignored, decimal)
+
+    return amounts, np.isnan(amounts)
+
+
+# Convierte a texto un bloque de valores y lo parsea. Los textos de más de _MAX_CHARS
+# caracteres se rechazan antes de armar la matriz, cuyo ancho es el del texto más largo.
+def _parse_values(values, ignored, decimal):
+    amounts = np.full(len(values), np.nan)
+
+    # Los nulos quedan como "None"/"nan" y se rechazan al validar
+    short = np.fromiter(map(len, map(str, values)), dtype=np.int64, count=len(values)) <= _MAX_CHARS
+    text = values[short].astype(str)
+    for code in CURRENCY_CODES:
+        if (np.strings.find(text, code) >= 0).any():
+            text = np.strings.replace(text, code, "")
+
+    amounts[short] = _parse_block(text, ignored, decimal)
+    return amounts
+
+
+# Cada fila es válida si, sin contar los caracteres ignorados, tiene dígitos, a lo sumo un
+# separador decimal, y un '-' o un '(' antes del primer dígito (con ')' después del último).
+# El valor es mantisa entera / 10**decimales, con el mismo redondeo que float().
+def _parse_block(text, ignored, decimal):
+    amounts = np.full(len(text), np.nan)
+    if len(text) == 0 or text.dtype.itemsize == 0:
+        return amounts
+
+    codes = np.ascontiguousarray(text).view(np.uint32).reshape(len(text), -1)
+    is_digit = (codes >= ord("0")) & (codes <= ord("9"))
+    is_point = codes == ord(decimal)
+    is_minus = codes == ord("-")
+    is_open = codes == ord("(")
+    is_close = codes == ord(")")
+
+    # Dígitos hasta cada posición (inclusive) y a su derecha
+    digits_seen = np.cumsum(is_digit, axis=1, dtype=np.int16)
+    digit_count = digits_seen[:, -1]
+    digits_right = digit_count[:, None] - digits_seen
+    before_digits = digits_seen == 0
+    after_digits = (digits_right == 0) & ~before_digits & ~is_digit
+
+    misplaced = (
+        ((is_minus | is_open) & ~before_digits)
+        | (is_close & ~after_digits)
+        | ~((codes == 0) | is_digit | is_point | is_minus | is_open | is_close | np.isin(codes, ignored))
+    )
+    sign_count = (is_minus | is_open).sum(axis=1)
+    valid = (
+        ~misplaced.any(axis=1)
+        & (digit_count > 0)
+        & (is_point.sum(axis=1) <= 1)
+        & (sign_count <= 1)
+        & (is_open.sum(axis=1) == is_close.sum(axis=1))
+    )
+    exact = valid & (digit_count <= _MAX_DIGITS)
+
+    digit_values = np.where(is_digit, codes - ord("0"), 0).astype(np.int64)
+    mantissa = (digit_values * _POW10[np.minimum(digits_right, _MAX_DIGITS)]).sum(axis=1)
+    # Los decimales son los dígitos a la derecha del separador decimal
+    decimals = np.where(is_point, digits_right, 0).sum(axis=1)
+    amounts[exact] = mantissa[exact] / _POW10[decimals[exact]]
+
+    # Más dígitos de los que entran exactos en la mantisa: se convierten uno por uno
+    for row in np.flatnonzero(valid & ~exact):
+        chars = codes[row][is_digit[row] | is_point[row]]
+        amounts[row] = float("".join(map(chr, chars)).replace(decimal, "."))
+
+    negative = valid & (sign_count > 0)
+    amounts[negative] *= -1
+    return amounts
@@ -0,0 +1,23 @@
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from app.config.settings import HTTP_POOL_SIZE
+
+_session = None
+_session_pid = None
+_lock = threading.Lock()
+
+
+# Sesión compartida por proceso: reutiliza las conexiones keep-alive entre descargas.
+# Se crea de nuevo en cada proceso hijo para no compartir sockets con el padre.
+def get_http_session() -> requests.Session:
+    global _session, _session_pid
+    with _lock:
+        if _session is None or _session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session, _session_pid = session, os.getpid()
+        return _session
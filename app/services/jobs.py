@@ -0,0 +1,222 @@
+from datetime import datetime
+import requests
+from sqlalchemy.orm import Session
+from app.config.settings import GET_ALL_PAGES_YIELD_PER
+from app.core.async_database import async_session_scope
+from app.core.database import session_scope
+from app.domain.repositories.page_repository import PageRepository
+from app.domain.repositories.page_async_repository import AsyncPageRepository, AsyncPageRollupRepository
+from app.domain.repositories.page_log_repository import PageLogRepository
+from app.domain.repositories.page_processed_repository import PageProcessedRepository
+from app.domain.repositories.page_rollup_repository import PageRollupRepository
+from app.services.page_service import PageService
+
+# Trabajos que ejecutan los handlers de NATS (app/config/nats_service.py) y el scheduler
+# (app/services/scheduler.py) a través del dispatcher
+
+# Creación de los repositorios
+def get_page_repository(db: Session) -> PageRepository:
+    return PageRepository(db)
+
+def get_page_log_repository(db: Session) -> PageLogRepository:
+    return PageLogRepository(db)
+
+def get_page_processed_repository(db: Session) -> PageProcessedRepository:
+    return PageProcessedRepository(db)
+
+def get_page_rollup_repository(db: Session) -> PageRollupRepository:
+    return PageRollupRepository(db)
+
+# Instanciación de PageService
+def get_page_service(db: Session) -> PageService:
+    page_repository = get_page_repository(db)
+    page_log_repository = get_page_log_repository(db)
+    page_processed_repository = get_page_processed_repository(db)
+    page_rollup_repository = get_page_rollup_repository(db)
+    return PageService(page_repository, page_log_repository, page_processed_repository, page_rollup_repository)
+
+# Trabajos bloqueantes: se ejecutan en el pool del dispatcher, nunca en el event loop.
+# Son funciones de módulo para poder enviarse también a un pool de procesos.
+def get_all_pages_job():
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        data = page_service.iter_all(GET_ALL_PAGES_YIELD_PER)
+        data_serializable = [item.to_dict() for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable
+        }
+
+def get_all_pages_page_job(cursor, limit):
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        data, next_cursor = page_service.get_page(cursor, limit)
+        data_serializable = [item.to_dict() for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable,
+            "next_cursor": next_cursor
+        }
+
+def total_amount_month_job():
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        data = page_service.total_amount_month()
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": float(data)
+        }
+
+def get_staging_from_date_job(date):
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        data = page_service.get_staging_from_date(date)
+        data_serializable = [item.to_dict() for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable
+        }
+
+def processing_data_job(date):
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        data = page_service.processing_data(date)
+        data_serializable = [item.to_dict() for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable
+        }
+
+def resume_processing_job(date):
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        data = page_service.resume_stale_processing(date)
+        data_serializable = [item.to_dict() for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable
+        }
+
+def save_to_data_lake_job(request_params):
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        try:
+            data = page_service.save_to_data_lake(request_params)
+            data_serializable = [data.to_dict()]
+
+            return {
+                "status": 200,
+                "message": "Success",
+                "data": data_serializable
+            }
+        except ValueError as e:
+            # Captura de ValueError (si el registro ya existe)
+            return {
+                "status": 400,
+                "message": f"Error: {str(e)}"
+            }
+        except requests.exceptions.RequestException as e:
+            # Captura de errores de red o problemas con la API
+            return {
+                "status": 500,
+                "message": f"API request failed: {str(e)}"
+            }
+        except Exception as e:
+            # Captura de cualquier otro error inesperado
+            return {
+                "status": 500,
+                "message": f"Unexpected error: {str(e)}"
+            }
+
+def save_to_data_lake_batch_job(items):
+    with session_scope() as db:
+        page_service = get_page_service(db)
+
+        try:
+            data = page_service.save_to_data_lake_batch(items)
+            return {
+                "status": 200,
+                "message": "Success",
+                "data": data
+            }
+        except Exception as e:
+            return {
+                "status": 500,
+                "message": f"Unexpected error: {str(e)}"
+            }
+
+# Trabajos del scheduler
+def claim_pending_job(limit):
+    with session_scope() as db:
+        return [
+            {**record.to_dict(), "lease_token": record.lease_token}
+            for record in PageRepository(db).claim_pending(limit)
+        ]
+
+def processing_claimed_job(staging_id, lease_token):
+    with session_scope() as db:
+        return get_page_service(db).processing_claimed(staging_id, lease_token).to_dict()
+
+# Variantes asíncronas de los trabajos de lectura (DB_READ_MODE=async): se ejecutan
+# directamente en el event loop con el engine asyncpg, sin ocupar hilos del dispatcher.
+async def get_all_pages_async_job():
+    async with async_session_scope() as db:
+        data = AsyncPageRepository(db).iter_all(GET_ALL_PAGES_YIELD_PER)
+        data_serializable = [item.to_dict() async for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable
+        }
+
+async def get_all_pages_page_async_job(cursor, limit):
+    async with async_session_scope() as db:
+        data = await AsyncPageRepository(db).get_page(cursor, limit)
+        next_cursor = data[-1].id if len(data) == limit else None
+        data_serializable = [item.to_dict() for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable,
+            "next_cursor": next_cursor
+        }
+
+async def total_amount_month_async_job():
+    async with async_session_scope() as db:
+        current_date = datetime.now()
+        data = await AsyncPageRollupRepository(db).total_amount_month(current_date.year, current_date.month)
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": float(data)
+        }
+
+async def get_staging_from_date_async_job(date):
+    async with async_session_scope() as db:
+        data = await AsyncPageRepository(db).get_staging_from_date(date)
+        data_serializable = [item.to_dict() for item in data]
+        return {
+            "status": 200,
+            "message": "Success",
+            "data": data_serializable
+        }
+
+ASYNC_READ_JOBS = {
+    get_all_pages_job: get_all_pages_async_job,
+    get_all_pages_page_job: get_all_pages_page_async_job,
+    total_amount_month_job: total_amount_month_async_job,
+    get_staging_from_date_job: get_staging_from_date_async_job,
+}
@@ -1,31 +1,66 @@
+import csv
+import hashlib
+import itertools
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
 import pandas as pd
-from app.domain.repositories.page_repository import PageRepository
+from app.config.settings import (
+    AMOUNT_DEFAULT_LOCALE,
+    AMOUNT_LOCALES,
+    EXCEL_SIDECAR_FORMAT,
+    HTTP_CHUNK_SIZE,
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_MAX_DOWNLOAD_BYTES,
+    HTTP_READ_TIMEOUT,
+    INGEST_BATCH_WORKERS,
+    INGEST_DEFAULT_PLATFORM_CONCURRENCY,
+    INGEST_PLATFORM_CONCURRENCY,
+    PROCESSING_CHUNK_SIZE,
+    PROCESSING_LEASE_SECONDS,
+    PROCESSING_WORKERS,
+)
+from app.core.database import SessionLocal
+from app.core.storage import open_text, processed_storage, raw_storage, strip_compression
+from app.core.metrics import (
+    HTTP_FETCH_BYTES,
+    HTTP_FETCH_SECONDS,
+    HTTP_FETCHES,
+    PROCESSING_FILE_SECONDS,
+    PROCESSING_ROWS,
+    PROCESSING_ROWS_PER_SECOND,
+    PROCESSING_STAGE_SECONDS,
+    timed_iter,
+)
+from app.domain.models.page_model import as_date
+from app.domain.repositories.page_repository import LeaseLostError, PageRepository
 from app.domain.repositories.page_log_repository import PageLogRepository
 from app.domain.repositories.page_processed_repository import PageProcessedRepository
+from app.domain.repositories.page_rollup_repository import PageRollupRepository
+from app.domain.repositories.page_unit_of_work import PageUnitOfWork
+from app.services.currency import parse_amounts
+from app.services.http_client import get_http_session
+from app.services.staging_reader import read_columns, read_staging_chunks, staging_read_options
 import requests
-import json
-import uuid
-import csv
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
 import os
 
-# Definir la carpeta base para guardar los archivos
-BASE_DIR = "data_lake_files"
-BASE_DIR_PROCESSED = "data_lake_processed"
-
-# Crear la carpeta si no existe
-if not os.path.exists(BASE_DIR):
-    os.makedirs(BASE_DIR)
-
-# Crear la carpeta si no existe
-if not os.path.exists(BASE_DIR_PROCESSED):
-    os.makedirs(BASE_DIR_PROCESSED)    
+# URLs de las APIs de origen por plataforma (page_id)
+PAGE_URLS = {
+    1: "https://api.mockaroo.com/api/d8c941d0?count=1000&key=9d6d4740",
+    2: "https://api.mockaroo.com/api/d216f630?count=1000&key=9d6d4740",
+}
 
 class PageService:
-    def __init__(self, staging : PageRepository, log : PageLogRepository, processed : PageProcessedRepository):
+    def __init__(self, staging : PageRepository, log : PageLogRepository, processed : PageProcessedRepository,
+                 rollup : PageRollupRepository):
         self.staging = staging 
         self.log = log 
         self.processed = processed 
+        self.rollup = rollup
 
     def create(self, data):
         return self.staging.create(data)
@@ -35,6 +70,15 @@ class PageService:
     
     def get_all(self):
         return self.staging.get_all()
+
+    def iter_all(self, batch_size : int):
+        return self.staging.iter_all(batch_size)
+
+    # Retorna (registros, cursor para la página siguiente o None si es la última)
+    def get_page(self, cursor : int = None, limit : int = 100):
+        rows = self.staging.get_page(cursor, limit)
+        next_cursor = rows[-1].id if len(rows) == limit else None
+        return rows, next_cursor
     
     def save_to_data_lake(self, data):
         print(data)
@@ -45,25 +89,12 @@ class PageService:
             raise ValueError("This record already exist")
 
         try:
-            url = ""
-            match data['page_id']:
-                case 1:
-                    url = "https://api.mockaroo.com/api/d8c941d0?count=1000&key=9d6d4740"
-                case 2:
-                    url = "https://api.mockaroo.com/api/d216f630?count=1000&key=9d6d4740"   
-            
+            url = self._resolve_url(data['page_id'])
             if not url:
                 raise ValueError("Page not found")
 
-            response = self._consume_api(url)
-            if response.status_code != 200:
-                error = f"Error consuming API: {response.status_code} {response.reason}"
-                self.save_log(error, data)
-                raise Exception(f"{error}: {response.status_code} {response.reason}")
-
-            file_path = self._save_response_file(response)
-            if not file_path:
-                error = "Unsupported Content-Type"
+            file_path, sidecar_path, fingerprint, error = self._download_to_data_lake(url, data['page_id'], data['date'])
+            if error:
                 self.save_log(error, data)
                 raise Exception(error)
 
@@ -71,134 +102,585 @@ class PageService:
                 "date" : data['date'],
                 "platform_id" : data['page_id'],
                 "file_path" : file_path,
+                "file_path_sidecar" : sidecar_path,
+                "fingerprint" : fingerprint,
                 "status" : "pending"
             }
-                
-            return self.create(data)
+
+            try:
+                return self.create(data)
+            except ValueError:
+                # Otra réplica registró la misma plataforma y fecha mientras se descargaba el archivo
+                self._remove_downloaded(file_path, sidecar_path)
+                raise
         except requests.exceptions.RequestException as e:
             error = "API request failed:"
             self.save_log(error, data)
             raise Exception(f"{error}: {str(e)}")    
-            
+
+    def save_to_data_lake_batch(self, items):
+        # Resultado por item, en el mismo orden: created / exists / error
+        results = [None] * len(items)
+        pending = {}
+        existing = self.staging.existing_pairs([(item['page_id'], item['date']) for item in items])
+
+        for index, item in enumerate(items):
+            key = (item['page_id'], as_date(item['date']))
+            url = self._resolve_url(item['page_id'])
+            if key in existing or key in pending:
+                results[index] = self._batch_result(item, "exists", message="This record already exist")
+            elif not url:
+                results[index] = self._batch_result(item, "error", message="Page not found")
+            else:
+                pending[key] = (index, item, url)
+
+        # Descargas concurrentes, limitadas por plataforma
+        semaphores = {
+            page_id: threading.BoundedSemaphore(
+                INGEST_PLATFORM_CONCURRENCY.get(str(page_id), INGEST_DEFAULT_PLATFORM_CONCURRENCY)
+            )
+            for page_id, _ in pending
+        }
+        downloads = {}
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(INGEST_BATCH_WORKERS, len(pending))) as executor:
+                futures = {
+                    key: executor.submit(self._download_limited, semaphores[key[0]], url, key)
+                    for key, (index, item, url) in pending.items()
+                }
+                for key, future in futures.items():
+                    try:
+                        downloads[key] = future.result()
+                    except requests.exceptions.RequestException as e:
+                        downloads[key] = (None, None, None, f"API request failed: {str(e)}")
+                    except Exception as e:
+                        downloads[key] = (None, None, None, str(e))
+
+        # Todas las filas de staging y los logs de error en una sola transacción
+        rows = []
+        for key, (index, item, url) in pending.items():
+            file_path, sidecar_path, fingerprint, error = downloads[key]
+            rows.append({
+                "date" : key[1],
+                "platform_id" : key[0],
+                "file_path" : file_path or "",
+                "file_path_sidecar" : sidecar_path,
+                "fingerprint" : fingerprint,
+                "status" : "request_error" if error else "pending"
+            })
+        created = self.staging.create_many(rows, commit=False)
+
+        logs = []
+        for key, (index, item, url) in pending.items():
+            file_path, sidecar_path, fingerprint, error = downloads[key]
+            record = created.get(key)
+            if record is None:
+                # Creado por otra réplica durante la descarga
+                self._remove_downloaded(file_path, sidecar_path)
+                results[index] = self._batch_result(item, "exists", message="This record already exist")
+            elif error:
+                logs.append({"staging_data_id" : record.id, "error_description" : error})
+                results[index] = self._batch_result(item, "error", record, error)
+            else:
+                results[index] = self._batch_result(item, "created", record)
+        self.log.create_many(logs)
+
+        return results
+
+    def _batch_result(self, item, status, record=None, message=None):
+        result = {"page_id": item['page_id'], "date": str(item['date']), "status": status}
+        if record is not None:
+            result["id"] = record.id
+        if message:
+            result["message"] = message
+        return result
+
+    def _download_limited(self, semaphore, url, key):
+        with semaphore:
+            return self._download_to_data_lake(url, *key)
+
+    def _resolve_url(self, page_id):
+        return PAGE_URLS.get(page_id)
+
+    # Descarga la respuesta de la API al data lake. Retorna (file_path, sidecar_path, fingerprint, error);
+    # error no es None cuando la API responde pero el archivo no se puede guardar.
+    def _download_to_data_lake(self, url, page_id, date):
+        host = urlparse(url).hostname or ""
+        result = "error"
+        try:
+            with HTTP_FETCH_SECONDS.time(host=host), self._consume_api(url) as response:
+                if response.status_code != 200:
+                    result = str(response.status_code)
+                    return None, None, None, f"Error consuming API: {response.status_code} {response.reason}"
+
+                stored = self._save_response_file(response, page_id, date)
+                if not stored:
+                    result = "unsupported"
+                    return None, None, None, "Unsupported Content-Type"
+
+                result = "ok"
+                HTTP_FETCH_BYTES.inc(stored.size, host=host)
+        finally:
+            HTTP_FETCHES.inc(host=host, result=result)
+
+        # Con el cuerpo ya guardado, la conexión vuelve al pool y el timer se detiene antes del
+        # sidecar y el fingerprint, que solo leen el archivo local
+        sidecar_path = self._write_excel_sidecar(stored.path)
+        return stored.path, sidecar_path, self._fingerprint(stored, sidecar_path), None
+
     def _consume_api(self, url):
-        return requests.get(url)
-        
-    def _save_response_file(self, response):
+        # Sesión con pool keep-alive; el cuerpo se lee en streaming al guardarlo
+        return get_http_session().get(url, stream=True, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+    def _response_extension(self, content_type):
+        if "application/json" in content_type:
+            return "json"
+        elif "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" in content_type or "application/vnd.ms-excel" in content_type:
+            return "xlsx"
+        elif "text/csv" in content_type:
+            return "csv"
+        return None
+
+    def _save_response_file(self, response, page_id, date):
         content_type = response.headers.get("Content-Type", "")
-        file_name = f"{uuid.uuid4()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        full_path = os.path.join(BASE_DIR, file_name)
+        extension = self._response_extension(content_type)
+        if not extension:
+            return None
 
+        # El cuerpo se copia al data lake por bloques, sin parsear el JSON ni el CSV, y se
+        # nombra por el hash de su contenido (ver app/core/storage.py)
         try:
-            if "application/json" in content_type:
-                data = response.json()
-                file_path = f"{file_name}.json"
-                with open(f"{full_path}.json", "w") as json_file:
-                    json.dump(data, json_file)
-                return file_path
-
-            elif "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet" in content_type or "application/vnd.ms-excel" in content_type:
-                file_path = f"{file_name}.xlsx"
-                with open(f"{full_path}.xlsx", "wb") as f:
-                    f.write(response.content)
-                return file_path
-
-            elif "text/csv" in content_type:
-                file_path = f"{file_name}.csv"
-                with open(f"{full_path}.csv", "w", newline='') as csv_file:
-                    csv_writer = csv.writer(csv_file)
-                    for row in response.text.splitlines():
-                        csv_writer.writerow(row.split(","))
-                return file_path
-
-            else:
-                return None
+            chunks = _limit_size(response.iter_content(chunk_size=HTTP_CHUNK_SIZE), response.headers.get("Content-Length"))
+            return raw_storage.save_chunks(chunks, page_id, date, extension)
 
         except Exception as e:
+            if isinstance(e, requests.exceptions.RequestException):
+                raise
             raise Exception(f"Error saving file: {str(e)}")
         
+    # Convierte un .xlsx recién descargado a EXCEL_SIDECAR_FORMAT, leyendo el libro en modo
+    # streaming. El libro original se conserva. Retorna la ruta del sidecar, o None si no
+    # aplica o si la conversión falla (en ese caso se procesa el libro original).
+    def _write_excel_sidecar(self, file_path):
+        if not file_path.endswith(".xlsx") or EXCEL_SIDECAR_FORMAT not in ("csv", "parquet"):
+            return None
+
+        sidecar_path = raw_storage.derived_path(file_path, f"sidecar.{EXCEL_SIDECAR_FORMAT}")
+        if raw_storage.exists(sidecar_path):
+            # El mismo libro ya se había descargado y convertido
+            return sidecar_path
+
+        temp_path = raw_storage.temp_path(sidecar_path)
+        try:
+            _excel_to_sidecar(raw_storage.path(file_path), temp_path, EXCEL_SIDECAR_FORMAT)
+            raw_storage.commit(temp_path, sidecar_path)
+            return sidecar_path
+        except Exception as e:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            print(f"No se pudo convertir {file_path} a {EXCEL_SIDECAR_FORMAT}: {str(e)}")
+            return None
+
+    # Huella del archivo: hash del contenido más una firma del esquema (formato y columnas).
+    # Retorna None si no se puede leer el encabezado; el registro se procesa completo.
+    def _fingerprint(self, stored, sidecar_path):
+        try:
+            columns = read_columns(raw_storage.path(sidecar_path or stored.path))
+        except Exception as e:
+            print(f"No se pudo leer el encabezado de {stored.path}: {str(e)}")
+            return None
+
+        file_format = os.path.splitext(strip_compression(stored.path))[1]
+        schema = f"{file_format}:{','.join(map(str, columns))}"
+        return hashlib.sha256(f"{stored.content_hash}|{schema}".encode()).hexdigest()
+
+    # Los archivos se comparten entre registros con el mismo contenido: solo se borran si
+    # ningún otro registro los usa
+    def _remove_downloaded(self, *paths):
+        for path in paths:
+            if path and not self.staging.file_in_use(path):
+                raw_storage.remove(path)
+
     def save_log(self, error, data):
+        # El registro y su log en una transacción
         data = {
             "date" : data['date'],
             "platform_id" : data['page_id'],
             "file_path" : "",
             "status" : "request_error"
         }
-        row = self.create(data)
-        log_data = {
-            "staging_data_id" : row.id,
-            "error_description" : error,
-        }
-        self.log.create(log_data)
-
-    def processing_data(self, date):
-        pending = self.staging.get_all_pending(date)
+        created = self.staging.create_many([data], commit=False)
+        logs = [
+            {"staging_data_id" : row.id, "error_description" : error}
+            for row in created.values()
+        ]
+        self.log.create_many(logs)
+
+    # Los pendientes de la fecha se toman en un solo commit, igual que en el scheduler
+    # (claim_pending): los que ya tomó otro proceso no se procesan dos veces. Mientras dura el
+    # lote, un hilo renueva el heartbeat de todos, también de los que esperan su turno. Los
+    # logs de error y los 'failed' se confirman juntos (PageUnitOfWork); cada archivo confirma
+    # aparte sus chunks y su paso a 'completed'.
+    def processing_data(self, date, workers : int = None):
+        workers = PROCESSING_WORKERS if workers is None else workers
+        with PageUnitOfWork(self.staging.db, "processing_data") as uow:
+            pending = self.staging.claim_pending(date=date)
+            if not pending:
+                return []
+
+            with _LeaseKeeper([el.id for el in pending], pending[0].lease_token) as lease:
+                if workers > 1 and len(pending) > 1:
+                    return self._processing_data_parallel(pending, workers, lease, uow)
+
+                for el in pending:
+                    self._processing_or_fail(el, lease, uow)
+
+                return pending
+
+    # Procesa un registro que el scheduler ya tomó con claim_pending (está en 'processing' con
+    # el lease lease_token)
+    def processing_claimed(self, staging_id : int, lease_token : str):
+        record = self.get_one(staging_id)
+        with PageUnitOfWork(self.staging.db, "scheduler") as uow, _LeaseKeeper([staging_id], lease_token) as lease:
+            self._processing_or_fail(record, lease, uow)
+        return record
+
+    # Si el archivo falla, queda 'failed' con su log al confirmar la unidad de trabajo. Si
+    # otro proceso le quitó el lease, se deja como está: ese proceso lo termina.
+    def _processing_or_fail(self, el, lease, uow):
+        try:
+            self.processing_file(el, lease)
+        except LeaseLostError as e:
+            print(f"Se deja el registro {el.id}: {str(e)}")
+            self.staging.db.rollback()
+        except Exception as e:
+            print(f"Error procesando el registro {el.id}: {str(e)}")
+            self.staging.db.rollback()
+            uow.change_status(el, 'failed', lease.lease_token)
+            uow.add_log(el.id, str(e))
+
+    def _processing_data_parallel(self, pending, workers, lease, uow):
+        # Cada proceso hace su propia lectura, limpieza, escritura e inserción
+        ids = [el.id for el in pending]
+        with ProcessPoolExecutor(max_workers=min(workers, len(ids)),
+                                 mp_context=multiprocessing.get_context("spawn")) as executor:
+            outcomes = list(executor.map(_process_staging_record, ids, [lease.lease_token] * len(ids)))
+
+        # Los procesos del pool confirmaron en sus propias sesiones: se expiran los registros
+        # para que al leerlos se recargue el estado final
+        self.staging.db.expire_all()
+        for el, (error, commits) in zip(pending, outcomes):
+            uow.commits += commits
+            if error is not None:
+                uow.change_status(el, 'failed', lease.lease_token)
+                uow.add_log(el.id, error)
+
+        return pending
+
+    # Retoma los archivos en 'processing' cuyo heartbeat venció (el proceso que los tenía se
+    # cayó): cada uno continúa desde su último chunk confirmado. Si vuelve a fallar, queda 'failed'.
+    def resume_stale_processing(self, date=None):
+        stale_before = datetime.now() - timedelta(seconds=PROCESSING_LEASE_SECONDS)
         result = []
-        for el in pending:
-            self.staging.change_staging_status(el.id, 'processing')
-            processed = self.processing_file(el)
+        with PageUnitOfWork(self.staging.db, "resume_processing") as uow:
+            for el in self.staging.get_stale_processing(stale_before, date):
+                lease_token = self.staging.claim_stale(el.id, stale_before)
+                if lease_token is None:
+                    continue
 
-            if not processed:
-                el.status = "error"
-                
-            result.append(el)
+                with _LeaseKeeper([el.id], lease_token) as lease:
+                    self._processing_or_fail(el, lease, uow)
+                result.append(el)
+
+        return result
 
-        return result 
-    
     def get_staging_from_date(self, date):
         return self.staging.get_staging_from_date(date)
 
-    def processing_file(self, data):
-        staging_path = os.path.join(BASE_DIR, data.file_path)
-        if staging_path.endswith(".csv"):
-            df = pd.read_csv(staging_path)
-        elif staging_path.endswith(".json"):
-            df = pd.read_json(staging_path)
-        elif staging_path.endswith(".xls") or staging_path.endswith(".xlsx"):
-            df = pd.read_excel(staging_path)
-        else:
-            self.staging.change_staging_status(data.id,'failed')
+    # Procesa un registro que quien llama tomó (claim_pending o claim_stale) y cuyo lease
+    # mantiene con un _LeaseKeeper. Si otro proceso le quita el lease, se detiene con
+    # LeaseLostError sin confirmar nada más.
+    def processing_file(self, data, lease):
+        # Los .xlsx se leen desde su sidecar (CSV o Parquet) cuando existe
+        staging_path = raw_storage.path(data.file_path_sidecar or data.file_path)
+        if not strip_compression(staging_path).endswith((".csv", ".json", ".xls", ".xlsx", ".parquet")):
+            # Quien llama lo marca como 'failed'
             raise ValueError("Formato de archivo no soportado")
-        
-        # Eliminar duplicados
-        df = df.drop_duplicates()
+        lease.check(data.id)
+
+        # Avance confirmado de una ejecución anterior que se cortó
+        checkpoint = self.staging.last_checkpoint(data.id)
+
+        # El mismo archivo ya se procesó para esta plataforma: se reutiliza su resultado
+        previous = None
+        if data.fingerprint and checkpoint is None:
+            previous = self.staging.get_completed_by_fingerprint(data.platform_id, data.fingerprint, data.id)
+        if previous is not None:
+            return self._link_processed(data, lease, previous)
+
+        # Las filas de cada chunk se confirman junto con su checkpoint (con el archivo completo en
+        # un solo chunk, junto con el paso a 'completed'). El CSV procesado se escribe en un
+        # archivo parcial fijo, que al retomar se recorta al último chunk confirmado.
+        partial_path = processed_storage.partial_path(data.platform_id, data.date, f"{data.id}.csv")
+        if checkpoint is not None and not _truncate_partial(partial_path, checkpoint.output_offset):
+            # No está la salida parcial (p. ej. se retoma en otro nodo): se empieza de nuevo
+            self.staging.reset_progress(data.id)
+            checkpoint = None
+
+        resumed = checkpoint is not None
+        resumed_read = checkpoint.rows_read if resumed else 0
+        resumed_inserted = checkpoint.rows_inserted if resumed else 0
+        chunk_index = checkpoint.chunk_index + 1 if resumed else 0
+        skip_rows = rows_read = resumed_read
+        rows_inserted = resumed_inserted
+
+        # Con PROCESSING_CHUNK_SIZE = 0 el archivo se procesa completo en memoria. Al retomar,
+        # los duplicados se eliminan también contra las filas ya confirmadas.
+        seen_rows = _SeenRows() if PROCESSING_CHUNK_SIZE > 0 or skip_rows else None
+        locale = AMOUNT_LOCALES.get(str(data.platform_id), AMOUNT_DEFAULT_LOCALE)
+        engine, columns = staging_read_options(data.platform_id)
+        started = time.perf_counter()
+        PROCESSING_ROWS.inc(resumed_read, stage="resumed")
+        with open(partial_path, "a" if resumed else "w", newline="") as output:
+            chunks = read_staging_chunks(staging_path, PROCESSING_CHUNK_SIZE, engine, columns)
+            for df in timed_iter(chunks, PROCESSING_STAGE_SECONDS, stage="read"):
+                lease.check(data.id)
+                if skip_rows:
+                    # Filas ya confirmadas: solo se registran para eliminar duplicados
+                    done, df = df.iloc[:skip_rows], df.iloc[skip_rows:]
+                    skip_rows -= len(done)
+                    seen_rows.drop_duplicates(done)
+                    if df.empty:
+                        continue
+                rows_read += len(df)
+
+                # Eliminar duplicados (en modo por chunks, también contra los chunks anteriores)
+                with PROCESSING_STAGE_SECONDS.time(stage="dedupe"):
+                    df = seen_rows.drop_duplicates(df) if seen_rows is not None else df.drop_duplicates()
+
+                with PROCESSING_STAGE_SECONDS.time(stage="clean"):
+                    df = self._clean_dataframe(df, locale)
+                    df['staging_data_id'] = data.id
+
+                with PROCESSING_STAGE_SECONDS.time(stage="write_csv"):
+                    df.to_csv(output, index=False, header=output.tell() == 0)
+                    output.flush()
+
+                with PROCESSING_STAGE_SECONDS.time(stage="bulk_insert"):
+                    self.staging.insert_bulk_data(df, commit=False)
+                rows_inserted += len(df)
+
+                if PROCESSING_CHUNK_SIZE > 0:
+                    with PROCESSING_STAGE_SECONDS.time(stage="checkpoint"):
+                        self.staging.save_checkpoint(data.id, lease.lease_token, chunk_index, rows_read,
+                                                     rows_inserted, output.tell())
+                chunk_index += 1
+
+            if output.tell() == 0:
+                pd.DataFrame(columns=["model_name", "amount", "staging_data_id"]).to_csv(output, index=False)
+
+        # Se publica el CSV procesado (comprimido y nombrado por su contenido) y se cierran el
+        # rollup y el estado en una transacción, solo si el registro sigue teniendo el lease
+        lease.check(data.id)
+        with PROCESSING_STAGE_SECONDS.time(stage="store_output"):
+            stored = processed_storage.store_file(partial_path, data.platform_id, data.date, "csv")
+
+        with PROCESSING_STAGE_SECONDS.time(stage="rollup"):
+            self.rollup.add_staging_data(data.id)
+
+        self.staging.delete_checkpoints(data.id)
+        self.staging.complete_processing(data.id, lease.lease_token, stored.path)
+        os.remove(partial_path)
+
+        elapsed = time.perf_counter() - started
+        PROCESSING_FILE_SECONDS.observe(elapsed)
+        PROCESSING_ROWS.inc(rows_read - resumed_read, stage="read")
+        PROCESSING_ROWS.inc(rows_inserted - resumed_inserted, stage="inserted")
+        PROCESSING_ROWS_PER_SECOND.set(rows_inserted / elapsed if elapsed else 0)
+        return True
+
+    # Copia las filas procesadas del registro anterior y apunta al mismo CSV procesado, sin
+    # leer ni limpiar el archivo. Todo en la misma transacción que el cambio de estado.
+    def _link_processed(self, data, lease, previous):
+        started = time.perf_counter()
+        with PROCESSING_STAGE_SECONDS.time(stage="link"):
+            rows = self.staging.copy_processed_rows(previous.id, data.id)
+
+        with PROCESSING_STAGE_SECONDS.time(stage="rollup"):
+            self.rollup.add_staging_data(data.id)
+
+        self.staging.complete_processing(data.id, lease.lease_token, previous.file_path_processed)
+
+        PROCESSING_FILE_SECONDS.observe(time.perf_counter() - started)
+        PROCESSING_ROWS.inc(rows, stage="linked")
+        return True
 
+    def _clean_dataframe(self, df, locale : str = AMOUNT_DEFAULT_LOCALE):
         # Eliminar filas con valores nulos
         df = df.dropna()
 
         if 'amount' in df.columns:
-            # Eliminar simbolos de pesos y comas para luego convertir 'amount' a float
-            df['amount'] = df['amount'].replace({'\$': '', ',': ''}, regex=True)
-            df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-
-            # Eliminar filas con valores no convertibles (NaN)
-            df = df.dropna(subset=['amount'])
+            # Convertir 'amount' a float según el formato de la plataforma (ver app/services/currency.py)
+            amounts, rejected = parse_amounts(df['amount'], locale)
+            PROCESSING_ROWS.inc(int(rejected.sum()), stage="amount_rejected")
 
-            # Filtrar solo los valores mayores a cero
-            df = df[df['amount'] > 0]
+            # Descartar los montos no convertibles y quedarse solo con los mayores a cero
+            df = df.assign(amount=amounts)[~rejected & (amounts > 0)]
 
         # Filtrar solo las columnas necesarias
         selected_columns = ["model_name", "amount"]
-        df = df[selected_columns]  
-
-        df['staging_data_id'] = data.id  
-
-        file_name = f"{uuid.uuid4()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        output_path = os.path.join(BASE_DIR_PROCESSED, file_name)    
-        df.to_csv(output_path, index=False)
-
-        data_dict = df.to_dict(orient='records')
-        self.staging.insert_bulk_data(data_dict)
-
-        self.staging.change_staging_status(data.id,'completed', file_name)
-        return True
+        return df[selected_columns]
 
     def total_amount_month(self):
         current_date = datetime.now()
         year = current_date.year
         month = current_date.month
-        return self.staging.total_amount_month(year, month)
-
-
-
-
-
+        return self.rollup.total_amount_month(year, month)
+
+
+# Corta la descarga si supera HTTP_MAX_DOWNLOAD_BYTES; si el servidor informa el tamaño, antes
+# de escribir nada
+def _limit_size(chunks, content_length):
+    if HTTP_MAX_DOWNLOAD_BYTES <= 0:
+        yield from chunks
+        return
+
+    if content_length and content_length.isdigit() and int(content_length) > HTTP_MAX_DOWNLOAD_BYTES:
+        raise ValueError(f"File too large: {content_length} bytes (max {HTTP_MAX_DOWNLOAD_BYTES})")
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if size > HTTP_MAX_DOWNLOAD_BYTES:
+            raise ValueError(f"File too large: more than {HTTP_MAX_DOWNLOAD_BYTES} bytes")
+        yield chunk
+
+
+# Filas por lote al escribir un sidecar Parquet
+_SIDECAR_BATCH_ROWS = 10000
+
+
+# Copia la primera hoja de un .xlsx a CSV o Parquet sin cargar el libro en memoria.
+# Los valores se guardan como texto, igual que en un CSV descargado.
+def _excel_to_sidecar(excel_path, sidecar_path, fmt):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None) or ()
+        if fmt == "parquet":
+            _write_parquet_sidecar(header, rows, sidecar_path)
+            return
+
+        with open_text(sidecar_path, "w", newline="") as sidecar_file:
+            writer = csv.writer(sidecar_file)
+            writer.writerow(header)
+            writer.writerows(rows)
+    finally:
+        workbook.close()
+
+
+def _write_parquet_sidecar(header, rows, sidecar_path):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(str(name), pa.string()) for name in header])
+    with pq.ParquetWriter(sidecar_path, schema) as writer:
+        while True:
+            batch = list(itertools.islice(rows, _SIDECAR_BATCH_ROWS))
+            if not batch:
+                break
+            columns = [
+                pa.array([None if value is None else str(value) for value in column], pa.string())
+                for column in zip(*batch)
+            ]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+
+
+# Recorta la salida parcial al último chunk confirmado. Retorna False si no existe o es más
+# corta de lo confirmado.
+def _truncate_partial(partial_path, offset):
+    if not os.path.exists(partial_path) or os.path.getsize(partial_path) < offset:
+        return False
+    os.truncate(partial_path, offset)
+    return True
+
+
+# Renueva el heartbeat de los registros de un lease en un hilo, con su propia sesión, cada
+# PROCESSING_LEASE_SECONDS / 3 mientras se procesan (también con PROCESSING_CHUNK_SIZE = 0, que
+# no guarda checkpoints). Si otro proceso le quitó uno, check() lanza LeaseLostError.
+class _LeaseKeeper:
+    def __init__(self, staging_ids : list, lease_token : str):
+        self.lease_token = lease_token
+        self.owned = set(staging_ids)
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stopped.set()
+        self._thread.join()
+        return False
+
+    def check(self, staging_id : int):
+        if staging_id not in self.owned:
+            raise LeaseLostError(f"El registro {staging_id} ya no tiene este lease")
+
+    def _run(self):
+        while self.owned and not self._stopped.wait(PROCESSING_LEASE_SECONDS / 3):
+            db = SessionLocal()
+            try:
+                # Los terminados también salen: ya no están en 'processing'
+                self.owned = set(PageRepository(db).renew_lease(list(self.owned), self.lease_token))
+            except Exception as e:
+                # Un error pasajero: se reintenta en la próxima vuelta
+                print(f"No se pudo renovar el heartbeat de los registros {sorted(self.owned)}: {str(e)}")
+            finally:
+                db.close()
+
+
+# Hashes (ordenados) de las filas ya vistas, para eliminar duplicados entre chunks
+class _SeenRows:
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def drop_duplicates(self, df):
+        hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+        positions = np.searchsorted(self.hashes, hashes)
+        seen = np.zeros(len(hashes), dtype=bool)
+        if len(self.hashes):
+            found = positions < len(self.hashes)
+            seen[found] = self.hashes[positions[found]] == hashes[found]
+
+        keep = ~seen & ~pd.Series(hashes).duplicated().to_numpy()
+
+        new_hashes = np.sort(hashes[keep])
+        self.hashes = np.insert(self.hashes, np.searchsorted(self.hashes, new_hashes), new_hashes)
+        return df[keep]
+
+
+# Se ejecuta en un proceso del pool de processing_data: abre su propia sesión. Retorna
+# (error o None, commits de la sesión); el proceso principal marca los fallidos.
+def _process_staging_record(staging_id, lease_token):
+    db = SessionLocal()
+    try:
+        service = PageService(PageRepository(db), PageLogRepository(db), PageProcessedRepository(db),
+                              PageRollupRepository(db))
+        with PageUnitOfWork(db) as uow, _LeaseKeeper([staging_id], lease_token) as lease:
+            error = None
+            try:
+                service.processing_file(service.get_one(staging_id), lease)
+            except LeaseLostError as e:
+                print(f"Se deja el registro {staging_id}: {str(e)}")
+                db.rollback()
+            except Exception as e:
+                print(f"Error procesando el registro {staging_id}: {str(e)}")
+                db.rollback()
+                error = str(e)
+        return error, uow.commits
+    finally:
+        db.close()
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from datetime import date as date_type, timedelta
+from app.config.dispatcher import dispatcher
+from app.config.settings import (
+    PROCESSING_LEASE_SECONDS,
+    SCHEDULER_BATCH_SIZE,
+    SCHEDULER_INGEST_DAYS_AHEAD,
+    SCHEDULER_INGEST_INTERVAL_SECONDS,
+    SCHEDULER_INGEST_PLATFORMS,
+    SCHEDULER_MAX_IN_FLIGHT,
+    SCHEDULER_POLL_SECONDS,
+)
+from app.core.cache import invalidate_date
+from app.core.metrics import SCHEDULER_IN_FLIGHT, SCHEDULER_RECORDS
+from app.domain.models.page_model import StatusEnum
+from app.services.jobs import (
+    claim_pending_job,
+    processing_claimed_job,
+    resume_processing_job,
+    save_to_data_lake_batch_job,
+)
+
+# Scheduler que corre en el event loop de la API: toma los registros pendientes con
+# claim_pending y los procesa en el pool del dispatcher (subject "scheduler"), sin esperar a
+# que llegue processing_data. Además descarga por adelantado las plataformas programadas y
+# retoma los archivos abandonados. Varios nodos pueden correrlo a la vez.
+
+
+class Scheduler:
+    def __init__(self, poll_seconds : float, batch_size : int, max_in_flight : int,
+                 ingest_platforms : list, ingest_days_ahead : int, ingest_interval : float,
+                 resume_interval : float):
+        self.poll_seconds = poll_seconds
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.ingest_platforms = ingest_platforms
+        self.ingest_days_ahead = ingest_days_ahead
+        self.ingest_interval = ingest_interval
+        self.resume_interval = resume_interval
+
+        self._runner = None
+        self._stopping = False
+        self._wake = None
+        self._tasks = set()
+
+    def start(self):
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    # Deja de tomar registros y espera a los que están en proceso
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        await self._runner
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._runner = None
+
+    async def _run(self):
+        next_ingest = next_resume = time.monotonic()
+        while not self._stopping:
+            self._wake.clear()
+            try:
+                now = time.monotonic()
+                if self.ingest_platforms and now >= next_ingest:
+                    next_ingest = now + self.ingest_interval
+                    await self._ingest()
+                if now >= next_resume:
+                    next_resume = now + self.resume_interval
+                    self._spawn(self._resume())
+                claimed = await self._claim()
+            except Exception as e:
+                print(f"Error en el scheduler: {str(e)}")
+                claimed = 0
+
+            # Si se llenó el lote puede haber más pendientes: se vuelve a consultar en cuanto
+            # se libere un lugar. Si no, se espera al intervalo o a que termine un archivo.
+            if claimed and claimed == self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    # Solo se toman los registros que pueden empezar ya: así no esperan en 'processing' y
+    # su lease no vence antes de procesarlos
+    async def _claim(self):
+        limit = min(self.batch_size, self.max_in_flight - len(self._tasks))
+        if limit <= 0:
+            await self._wake.wait()
+            return 0
+
+        records = await dispatcher.run("scheduler", claim_pending_job, limit)
+        for record in records:
+            invalidate_date(record['date'])
+            self._spawn(self._process(record))
+        return len(records)
+
+    async def _process(self, record):
+        result = await dispatcher.run("scheduler", processing_claimed_job, record['id'], record['lease_token'])
+        invalidate_date(record['date'])
+        SCHEDULER_RECORDS.inc(status=StatusEnum(result['status']).value)
+
+    async def _resume(self):
+        res = await dispatcher.run("scheduler", resume_processing_job, None)
+        for item in res['data']:
+            invalidate_date(item['date'])
+            SCHEDULER_RECORDS.inc(status=StatusEnum(item['status']).value)
+
+    # Descarga las plataformas programadas para hoy y los días siguientes; las que ya
+    # están en staging se omiten
+    async def _ingest(self):
+        today = date_type.today()
+        items = [
+            {"page_id": page_id, "date": (today + timedelta(days=days)).isoformat()}
+            for days in range(self.ingest_days_ahead + 1)
+            for page_id in self.ingest_platforms
+        ]
+        res = await dispatcher.run("save_to_data_lake_batch", save_to_data_lake_batch_job, items)
+        if res['status'] != 200:
+            print(f"Error en la ingesta programada: {res['message']}")
+            return
+        for item in res['data']:
+            if item['status'] != "exists":
+                invalidate_date(item['date'])
+
+    # Cada trabajo ocupa un lugar de max_in_flight mientras está en curso
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        SCHEDULER_IN_FLIGHT.set(len(self._tasks))
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        SCHEDULER_IN_FLIGHT.set(len(self._tasks))
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Error en un trabajo del scheduler: {task.exception()!r}")
+        self._wake.set()
+
+
+scheduler = Scheduler(
+    poll_seconds=SCHEDULER_POLL_SECONDS,
+    batch_size=SCHEDULER_BATCH_SIZE,
+    max_in_flight=SCHEDULER_MAX_IN_FLIGHT,
+    ingest_platforms=SCHEDULER_INGEST_PLATFORMS,
+    ingest_days_ahead=SCHEDULER_INGEST_DAYS_AHEAD,
+    ingest_interval=SCHEDULER_INGEST_INTERVAL_SECONDS,
+    resume_interval=PROCESSING_LEASE_SECONDS,
+)
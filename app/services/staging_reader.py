@@ -0,0 +1,400 @@
+import csv
+import itertools
+import json
+import os
+import pandas as pd
+from app.config.settings import (
+    PROCESSING_MEMORY_LIMIT_MB,
+    STAGING_DEFAULT_ENGINE,
+    STAGING_DEFAULT_PROJECTION,
+    STAGING_ENGINES,
+    STAGING_PROJECTIONS,
+)
+from app.core.storage import open_text, strip_compression
+
+# Lectura de los archivos de staging para processing_file. Con proyección solo se parsean
+# model_name, amount y las columnas que identifican una fila (para eliminar duplicados),
+# con tipos explícitos: model_name como categoría y el resto como texto.
+
+ENGINES = ("pandas", "arrow")
+
+# Columnas que usa processing_file
+VALUE_COLUMNS = ["model_name", "amount"]
+
+# Copias de un chunk que conviven en memoria durante la limpieza (lectura, limpieza y salida)
+_CHUNK_MEMORY_COPIES = 3
+
+
+# Motor y columnas a leer de una plataforma: (engine, None = todas | lista de columnas)
+def staging_read_options(platform_id):
+    engine = STAGING_ENGINES.get(str(platform_id), STAGING_DEFAULT_ENGINE).lower()
+    if engine not in ENGINES:
+        raise ValueError(f"Motor de lectura no soportado: {engine}")
+
+    projection = STAGING_PROJECTIONS.get(str(platform_id), STAGING_DEFAULT_PROJECTION).strip()
+    if projection.lower() == "all":
+        return engine, None
+    keys = [] if projection.lower() == "none" else [c.strip() for c in projection.split("|") if c.strip()]
+    return engine, VALUE_COLUMNS + [c for c in keys if c not in VALUE_COLUMNS]
+
+
+# Retorna un iterador de DataFrames; con chunk_size <= 0, uno solo con el archivo completo
+# Los archivos comprimidos (.gz, .zst) se descomprimen al leerlos
+def read_staging_chunks(staging_path, chunk_size, engine : str = "pandas", columns : list = None):
+    file_format = os.path.splitext(strip_compression(staging_path))[1]
+    if engine == "arrow" and file_format in (".csv", ".json"):
+        chunks = _arrow_chunks(staging_path, file_format, chunk_size, columns)
+        if chunks is not None:
+            yield from chunks
+            return
+
+    yield from _pandas_chunks(staging_path, file_format, chunk_size, columns)
+
+
+def _pandas_chunks(staging_path, file_format, chunk_size, columns):
+    usecols = None if columns is None else columns.__contains__
+    dtype = None if columns is None else _pandas_dtypes(columns)
+
+    if chunk_size <= 0:
+        if file_format == ".csv":
+            yield pd.read_csv(staging_path, usecols=usecols, dtype=dtype)
+        elif file_format == ".json":
+            yield _project(pd.read_json(staging_path, lines=not _is_json_array(staging_path)), columns)
+        elif file_format == ".parquet":
+            yield _project(pd.read_parquet(staging_path, columns=_parquet_columns(staging_path, columns)), columns)
+        else:
+            yield pd.read_excel(staging_path, usecols=usecols, dtype=dtype)
+        return
+
+    if file_format == ".csv":
+        # Todo como texto para que un mismo valor tenga el mismo tipo en todos los chunks
+        reader = pd.read_csv(staging_path, usecols=usecols, dtype=dtype or str, iterator=True)
+        chunks = _iter_reader(reader.get_chunk, chunk_size)
+    elif file_format == ".json":
+        chunks = (_project(df, columns) for df in _iter_json(staging_path, chunk_size))
+    elif file_format == ".parquet":
+        chunks = (_project(df, columns) for df in _iter_parquet(staging_path, chunk_size, columns))
+    elif file_format == ".xlsx":
+        chunks = (_project(df, columns) for df in _iter_excel(staging_path, chunk_size))
+    else:
+        # openpyxl no lee .xls: se lee completo y se recorre por chunks
+        df = pd.read_excel(staging_path, usecols=usecols, dtype=dtype)
+        chunks = _iter_reader(_frame_reader(df), chunk_size)
+
+    yield from chunks
+
+
+def _pandas_dtypes(columns):
+    return {column: "category" if column == "model_name" else str for column in columns}
+
+
+# Proyección para los lectores que no la admiten al parsear (JSON, Excel por streaming)
+def _project(df, columns):
+    if columns is None:
+        return df
+    df = df[[column for column in df.columns if column in columns]]
+    if "model_name" in df.columns:
+        df = df.astype({"model_name": "category"})
+    return df
+
+
+# Columnas de un archivo de staging, leyendo solo el encabezado (o el primer registro)
+def read_columns(staging_path):
+    file_format = os.path.splitext(strip_compression(staging_path))[1]
+    if file_format == ".csv":
+        with open_text(staging_path, newline="") as csv_file:
+            return next(csv.reader(csv_file), [])
+    if file_format == ".json":
+        return list(_first_json_record(staging_path))
+    if file_format == ".parquet":
+        import pyarrow.parquet as pq
+
+        return pq.read_schema(staging_path).names
+    if file_format == ".xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(staging_path, read_only=True, data_only=True)
+        try:
+            return [str(name) for name in next(workbook.active.iter_rows(values_only=True), ())]
+        finally:
+            workbook.close()
+    return [str(name) for name in pd.read_excel(staging_path, nrows=0).columns]
+
+
+# Primer registro de un arreglo JSON o de un JSON por líneas, sin leer el resto del archivo
+def _first_json_record(staging_path):
+    decoder = json.JSONDecoder()
+    with open_text(staging_path) as json_file:
+        text = ""
+        while True:
+            block = json_file.read(64 * 1024)
+            text += block
+            start = text.lstrip().lstrip("[").lstrip()
+            if start.startswith("]"):
+                return {}
+            try:
+                record, _ = decoder.raw_decode(start)
+                return record if isinstance(record, dict) else {}
+            except json.JSONDecodeError:
+                if not block:
+                    return {}
+
+
+# Lee chunks con read(size) ajustando el tamaño al límite de memoria configurado
+def _iter_reader(read, chunk_size):
+    size = chunk_size
+    while True:
+        try:
+            chunk = read(size)
+        except StopIteration:
+            return
+        if len(chunk) == 0:
+            return
+        yield chunk
+        size = _chunk_rows_for_memory(chunk, chunk_size)
+
+
+# read(size) para _iter_reader sobre un DataFrame ya leído
+def _frame_reader(df):
+    position = 0
+
+    def read(size):
+        nonlocal position
+        chunk = df.iloc[position:position + size]
+        position += len(chunk)
+        return chunk
+
+    return read
+
+
+def _chunk_rows_for_memory(chunk, chunk_size):
+    if PROCESSING_MEMORY_LIMIT_MB <= 0 or len(chunk) == 0:
+        return chunk_size
+
+    bytes_per_row = chunk.memory_usage(deep=True).sum() / len(chunk)
+    limit = PROCESSING_MEMORY_LIMIT_MB * 1024 * 1024
+    rows = int(limit / (bytes_per_row * _CHUNK_MEMORY_COPIES))
+    return max(1, min(chunk_size, rows))
+
+
+def _is_json_array(staging_path):
+    with open_text(staging_path) as json_file:
+        first = json_file.read(1)
+        while first and first.isspace():
+            first = json_file.read(1)
+        return first == "["
+
+
+# skip: registros que ya se leyeron con arrow (ver _arrow_json_chunks)
+def _iter_json(staging_path, chunk_size, skip=0):
+    array = _is_json_array(staging_path)
+    with open_text(staging_path) as json_file:
+        # Arreglo JSON: los registros se decodifican de a uno a medida que se lee el archivo.
+        # JSON por líneas: cada línea es un registro
+        if array:
+            records = _iter_json_array(json_file)
+        else:
+            records = (json.loads(line) for line in json_file if line.strip())
+        records = itertools.islice(records, skip, None)
+
+        def read(size):
+            rows = []
+            for record in records:
+                rows.append(record)
+                if len(rows) >= size:
+                    break
+            if not rows:
+                raise StopIteration
+            return pd.DataFrame(rows, dtype=object)
+
+        yield from _iter_reader(read, chunk_size)
+
+
+# Registros de un arreglo JSON, leyendo el archivo por bloques
+def _iter_json_array(json_file):
+    decoder = json.JSONDecoder()
+    # Se descarta el "[" inicial
+    while json_file.read(1).isspace():
+        pass
+    text = ""
+    position = 0
+    eof = False
+    while True:
+        # Se saltan espacios y separadores entre registros
+        while position < len(text) and (text[position].isspace() or text[position] == ","):
+            position += 1
+        if position < len(text) and text[position] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(text, position)
+            # Un número al final del bloque puede estar cortado: se confirma con el siguiente
+            complete = end < len(text) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError("Arreglo JSON incompleto o inválido")
+            complete = False
+        if complete:
+            yield record
+            position = end
+            continue
+
+        # El registro sigue en el próximo bloque; el bloque crece con el registro para no
+        # volver a decodificar muchas veces un registro grande
+        text = text[position:]
+        block = json_file.read(max(64 * 1024, len(text)))
+        eof = not block
+        text += block
+        position = 0
+
+
+def _iter_excel(staging_path, chunk_size):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(staging_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        def read(size):
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= size:
+                    break
+            if not batch:
+                raise StopIteration
+            return pd.DataFrame(batch, columns=header, dtype=object)
+
+        yield from _iter_reader(read, chunk_size)
+    finally:
+        workbook.close()
+
+
+def _parquet_columns(staging_path, columns):
+    if columns is None:
+        return None
+    import pyarrow.parquet as pq
+
+    return [name for name in pq.read_schema(staging_path).names if name in columns]
+
+
+def _iter_parquet(staging_path, chunk_size, columns=None):
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(staging_path)
+    batches = parquet_file.iter_batches(batch_size=chunk_size, columns=_parquet_columns(staging_path, columns))
+    yield from _iter_reader(_arrow_reader(batches), chunk_size)
+
+
+# Motor arrow: CSV y JSON por líneas con los lectores multihilo de pyarrow. Todo se lee
+# como texto (model_name como diccionario, que pandas recibe como categoría). Retorna None
+# si el archivo no se puede leer con arrow (arreglo JSON, tipos mezclados en un JSON) y se
+# usa el motor pandas.
+def _arrow_chunks(staging_path, file_format, chunk_size, columns):
+    import pyarrow as pa
+
+    if file_format == ".csv":
+        return _arrow_csv_chunks(staging_path, chunk_size, columns)
+
+    if _is_json_array(staging_path):
+        return None
+
+    from pyarrow import json as pa_json
+
+    if chunk_size > 0:
+        return _arrow_json_chunks(staging_path, chunk_size, columns)
+
+    try:
+        table = pa_json.read_json(staging_path, read_options=pa_json.ReadOptions(use_threads=True))
+        table = table.select([name for name in table.column_names if columns is None or name in columns])
+        table = table.cast(pa.schema([(name, _arrow_type(name)) for name in table.column_names]))
+    except pa.ArrowException as e:
+        print(f"No se pudo leer {staging_path} con arrow, se usa pandas: {str(e)}")
+        return None
+
+    return iter([table.to_pandas()])
+
+
+# JSON por líneas en streaming: los tipos se infieren del primer bloque. Si un bloque
+# posterior no coincide, se sigue con pandas desde la primera fila que no se entregó.
+def _arrow_json_chunks(staging_path, chunk_size, columns):
+    import pyarrow as pa
+    from pyarrow import json as pa_json
+
+    try:
+        reader = pa_json.open_json(staging_path, read_options=pa_json.ReadOptions(use_threads=True))
+    except pa.ArrowException as e:
+        print(f"No se pudo leer {staging_path} con arrow, se usa pandas: {str(e)}")
+        return None
+
+    names = [name for name in reader.schema.names if columns is None or name in columns]
+    schema = pa.schema([(name, _arrow_type(name)) for name in names])
+
+    def chunks():
+        rows = 0
+        try:
+            for df in _iter_reader(_arrow_reader(batch.select(names).cast(schema) for batch in reader), chunk_size):
+                rows += len(df)
+                yield df
+        except pa.ArrowException as e:
+            print(f"No se pudo seguir leyendo {staging_path} con arrow, se usa pandas desde la fila {rows}: {str(e)}")
+            yield from (_project(df, columns) for df in _iter_json(staging_path, chunk_size, skip=rows))
+
+    return chunks()
+
+
+def _arrow_csv_chunks(staging_path, chunk_size, columns):
+    from pyarrow import csv as pa_csv
+
+    with open_text(staging_path, newline="") as csv_file:
+        header = next(csv.reader(csv_file), [])
+    include = [name for name in header if columns is None or name in columns]
+
+    read_options = pa_csv.ReadOptions(use_threads=True)
+    convert_options = pa_csv.ConvertOptions(
+        include_columns=include,
+        column_types={name: _arrow_type(name) for name in include},
+        strings_can_be_null=True,
+    )
+    if chunk_size <= 0:
+        table = pa_csv.read_csv(staging_path, read_options=read_options, convert_options=convert_options)
+        return iter([table.to_pandas()])
+
+    reader = pa_csv.open_csv(staging_path, read_options=read_options, convert_options=convert_options)
+    return _iter_reader(_arrow_reader(reader), chunk_size)
+
+
+def _arrow_type(name):
+    import pyarrow as pa
+
+    return pa.dictionary(pa.int32(), pa.string()) if name == "model_name" else pa.string()
+
+
+# read(size) para _iter_reader sobre bloques de arrow (Parquet, CSV y JSON en streaming):
+# junta bloques hasta size filas y deja el resto para la próxima llamada
+def _arrow_reader(batches):
+    import pyarrow as pa
+
+    batches = iter(batches)
+    pending = []
+    rows = 0
+
+    def read(size):
+        nonlocal pending, rows
+        while rows < size:
+            batch = next(batches, None)
+            if batch is None:
+                break
+            pending.append(batch)
+            rows += batch.num_rows
+        if not rows:
+            raise StopIteration
+
+        table = pa.Table.from_batches(pending)
+        rest = table.slice(size)
+        pending, rows = rest.to_batches(), rest.num_rows
+        return table.slice(0, size).to_pandas()
+
+    return read
@@ -0,0 +1,71 @@
+import argparse
+import asyncio
+import multiprocessing
+import os
+import signal
+from app.config.settings import NATS_WORKER_PROCESSES, NATS_WORKER_SUBJECTS
+from app.config.nats_service import connect_nats, close_nats, listen_to_nats
+
+# Punto de entrada de los workers de NATS, independiente de la aplicación FastAPI:
+#   python -m app.worker --processes 4 --subjects processing_data,save_to_data_lake
+# Cada proceso abre su propia conexión a NATS y su propio pool de base de datos, y se
+# suscribe en el queue group compartido, por lo que se pueden sumar procesos y nodos
+# sin que un mensaje se atienda dos veces.
+
+
+async def run_worker(subjects=None):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await connect_nats()
+    await listen_to_nats(subjects)
+    print(f"Worker {os.getpid()} escuchando NATS")
+
+    await stop.wait()
+
+    await close_nats()
+    print(f"Worker {os.getpid()} detenido")
+
+
+def _worker_main(subjects):
+    asyncio.run(run_worker(subjects))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Workers NATS de pages-ms")
+    parser.add_argument("--processes", type=int, default=NATS_WORKER_PROCESSES)
+    parser.add_argument("--subjects", default=",".join(NATS_WORKER_SUBJECTS),
+                        help="Subjects a atender separados por coma (por defecto todos)")
+    args = parser.parse_args()
+
+    subjects = [s.strip() for s in args.subjects.split(",") if s.strip()] or None
+
+    if args.processes <= 1:
+        _worker_main(subjects)
+        return
+
+    # 'spawn' para que cada proceso cree su engine y su cliente NATS desde cero
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=_worker_main, args=(subjects,), name=f"pages-worker-{i}")
+        for i in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop_workers(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, stop_workers)
+    signal.signal(signal.SIGINT, stop_workers)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from app.services.currency import parse_amounts
+from scripts.bench_pipeline import generate_rows
+
+# Compara parse_amounts con la limpieza anterior de 'amount' (regex + to_numeric):
+#   python -m scripts.bench_amount_parser [--rows 1000000] [--repeat 5]
+
+
+def regex_path(values):
+    amounts = values.replace({'\\$': '', ',': ''}, regex=True)
+    return pd.to_numeric(amounts, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def vectorized_path(values):
+    return parse_amounts(values)[0]
+
+
+def measure(fn, values, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(values)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del parser de montos")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Mismos montos sucios que el benchmark del pipeline, leídos como texto
+    values = generate_rows(args.rows)["amount"].astype(object)
+
+    regex_seconds, regex_amounts = measure(regex_path, values, args.repeat)
+    vectorized_seconds, amounts = measure(vectorized_path, values, args.repeat)
+
+    both = ~np.isnan(regex_amounts) & ~np.isnan(amounts)
+    print(f"filas: {len(values)}")
+    print(f"regex + to_numeric: {regex_seconds:.3f}s")
+    print(f"parse_amounts:      {vectorized_seconds:.3f}s ({regex_seconds / vectorized_seconds:.1f}x)")
+    print(f"aceptados: regex {int((~np.isnan(regex_amounts)).sum())}, parse_amounts {int((~np.isnan(amounts)).sum())}")
+    print(f"valores distintos entre ambos: {int((regex_amounts[both] != amounts[both]).sum())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import argparse
+import json
+import time
+from datetime import date, timedelta
+from app.config import codec
+
+# Costo de codificar la respuesta de get_all_pages por cada 10k registros:
+#   python -m scripts.bench_codec [--rows 10000] [--repeat 20]
+# Las combinaciones cuyo paquete opcional no está instalado se omiten.
+
+
+def build_response(rows):
+    start = date(2025, 1, 1)
+    data = [
+        {
+            "id": i + 1,
+            "date": (start + timedelta(days=i % 365)).isoformat(),
+            "platform_id": i % 2 + 1,
+            "status": "completed" if i % 3 else "pending",
+        }
+        for i in range(rows)
+    ]
+    return {"status": 200, "message": "Success", "data": data}
+
+
+def stdlib_json(res):
+    return json.dumps(res).encode(), None
+
+
+def measure(fn, res, repeat):
+    payload, _ = fn(res)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(res)
+        best = min(best, time.perf_counter() - started)
+    return best, len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara el costo de los formatos de respuesta de NATS")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    res = build_response(args.rows)
+    cases = [("json (stdlib)", stdlib_json)]
+    content_types = [codec.JSON] + ([codec.MSGPACK] if codec.msgpack is not None else [])
+    for content_type in content_types:
+        for encoding in [None] + codec.available_encodings():
+            name = "msgpack" if content_type == codec.MSGPACK else "orjson" if codec.orjson else "json"
+            name += f" + {encoding}" if encoding else ""
+            cases.append((name, lambda res, c=content_type, e=encoding: codec.encode(res, c, e)))
+
+    print(f"{'formato':<32}{'ms / 10k filas':>16}{'bytes':>12}")
+    for name, fn in cases:
+        seconds, size = measure(fn, res, args.repeat)
+        print(f"{name:<32}{seconds * 1000 * 10000 / args.rows:>16.2f}{size:>12}")
+
+
+if __name__ == "__main__":
+    main()
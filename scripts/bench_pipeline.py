@@ -0,0 +1,273 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+
+# Benchmark de ingesta (save_to_data_lake) y procesamiento (processing_data):
+#   python -m scripts.bench_pipeline --formats csv,json,xlsx --rows 1000,100000
+#   python -m scripts.bench_pipeline --url postgresql://... --reset-db --compare anterior.json
+#   python -m scripts.bench_pipeline --engine arrow --projection id --compare anterior.json
+# Genera archivos sintéticos con la forma de las respuestas de mockaroo, los sirve con un
+# servidor HTTP local y ejecuta cada caso en un proceso nuevo (el pico de RSS es por caso).
+# Por defecto usa un SQLite temporal. Con --url, las tablas de esa base se borran y se
+# vuelven a crear (--reset-db es obligatorio): usar solo una base descartable.
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "json": "application/json",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Límite de filas de una hoja de Excel, sin contar el encabezado
+XLSX_MAX_ROWS = 1048575
+
+MODELS = ["Civic", "Corolla", "F-150", "Model 3", "Golf", "Mustang", "Camry", "Accord", "Silverado", "Leaf"]
+FIRST_NAMES = ["Ana", "Luis", "María", "Jorge", "Lucía", "Pedro", "Sofía", "Diego"]
+LAST_NAMES = ["García", "Pérez", "Gómez", "Rodríguez", "López", "Díaz"]
+
+BENCH_DATE = "2025-01-15"
+
+
+def _format_amount(value, style):
+    if style == 0:
+        return f"${value:,.2f}"
+    if style == 1:
+        return f"${value:.2f}"
+    if style == 2:
+        return f"{value:,.2f}"
+    if style == 3:
+        return "n/a"
+    if style == 4:
+        return f"-{value:.2f}"
+    return f"{value:.2f}"
+
+
+# Filas con la forma de mockaroo y 'amount' sucio: "$1,234.50", "1234.50", "n/a", negativos,
+# ~3% de nulos en model_name y amount y ~5% de filas duplicadas
+def generate_rows(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    unique = max(1, int(rows * 0.95))
+
+    amounts = rng.uniform(1, 5000, unique).round(2)
+    styles = rng.choice(6, unique, p=[0.4, 0.1, 0.1, 0.03, 0.02, 0.35])
+    df = pd.DataFrame({
+        "id": np.arange(1, unique + 1),
+        "first_name": rng.choice(FIRST_NAMES, unique),
+        "last_name": rng.choice(LAST_NAMES, unique),
+        "email": [f"user{i}@example.com" for i in range(unique)],
+        "model_name": rng.choice(MODELS, unique).astype(object),
+        "amount": [_format_amount(value, style) for value, style in zip(amounts, styles)],
+        "date": BENCH_DATE,
+    })
+    df.loc[rng.random(unique) < 0.03, "model_name"] = None
+    df.loc[rng.random(unique) < 0.03, "amount"] = None
+
+    duplicates = df.iloc[rng.integers(0, unique, rows - unique)]
+    df = pd.concat([df, duplicates], ignore_index=True)
+    return df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+
+def generate_file(directory, fmt, rows, seed=42):
+    if fmt == "xlsx" and rows > XLSX_MAX_ROWS:
+        print(f"xlsx admite hasta {XLSX_MAX_ROWS} filas; se usan {XLSX_MAX_ROWS} en lugar de {rows}")
+        rows = XLSX_MAX_ROWS
+
+    path = os.path.join(directory, f"staging_{rows}.{fmt}")
+    if os.path.exists(path):
+        return path, rows
+
+    df = generate_rows(rows, seed)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "json":
+        df.to_json(path, orient="records")
+    else:
+        df.to_excel(path, index=False, engine="openpyxl")
+    return path, rows
+
+
+class _StagingFileHandler(SimpleHTTPRequestHandler):
+    def guess_type(self, path):
+        return CONTENT_TYPES.get(path.rsplit(".", 1)[-1], "application/octet-stream")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server(directory):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_StagingFileHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Se ejecuta en un proceso nuevo: la configuración se toma del entorno al importar la app
+def run_case(case, database_url, workdir, env):
+    os.environ.update(env)
+    os.environ["DATABASE_URL"] = database_url
+    os.chdir(workdir)
+
+    import resource
+    from sqlalchemy import func
+    from app.services.jobs import get_page_service
+    from app.core.database import Base, engine, session_scope
+    from app.core.metrics import DB_BATCH_COMMITS, PROCESSING_STAGE_SECONDS
+    from app.domain.models.page_model import PageProcessedData
+    from app.services import page_service
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    server = start_stub_server(os.path.dirname(case["path"]))
+    url = f"http://127.0.0.1:{server.server_port}/{os.path.basename(case['path'])}"
+    page_service.PAGE_URLS = {page_id: url for page_id in range(1, case["files"] + 1)}
+
+    try:
+        with session_scope() as db:
+            service = get_page_service(db)
+
+            started = time.perf_counter()
+            for page_id in page_service.PAGE_URLS:
+                service.save_to_data_lake({"page_id": page_id, "date": BENCH_DATE})
+            ingestion = time.perf_counter() - started
+
+            started = time.perf_counter()
+            records = service.processing_data(BENCH_DATE)
+            processing = time.perf_counter() - started
+
+            failed = sum(1 for record in records if record.status != "completed")
+            inserted = db.query(func.count(PageProcessedData.id)).scalar()
+    finally:
+        server.shutdown()
+
+    rows = case["rows"] * case["files"]
+    return {
+        **{key: case[key] for key in ("format", "rows", "files")},
+        "file_bytes": os.path.getsize(case["path"]),
+        "ingestion_seconds": ingestion,
+        "processing_seconds": processing,
+        "rows_per_second": rows / processing if processing else 0.0,
+        "rows_inserted": inserted,
+        "failed_files": failed,
+        # Vacío con PROCESSING_WORKERS > 1: las etapas se miden en los procesos del pool
+        "stages": {key[0]: total for key, (count, total) in sorted(PROCESSING_STAGE_SECONDS.totals().items())},
+        # Commits de la base durante processing_data (incluye los de los procesos del pool)
+        "commits": int(DB_BATCH_COMMITS.totals().get(("processing_data",), (0, 0))[1]),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results, baseline=None):
+    previous = {(r["format"], r["rows"], r["files"]): r for r in (baseline or {}).get("cases", [])}
+    print(f"{'caso':<22}{'ingesta s':>11}{'proceso s':>11}{'filas/s':>12}{'RSS MB':>9}{'vs base':>9}")
+    for result in results:
+        key = (result["format"], result["rows"], result["files"])
+        name = f"{result['format']} {result['rows']}x{result['files']}"
+        ratio = ""
+        if key in previous and previous[key]["rows_per_second"]:
+            ratio = f"{result['rows_per_second'] / previous[key]['rows_per_second']:.2f}x"
+        print(f"{name:<22}{result['ingestion_seconds']:>11.2f}{result['processing_seconds']:>11.2f}"
+              f"{result['rows_per_second']:>12.0f}{result['peak_rss_mb']:>9.0f}{ratio:>9}")
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result["stages"].items())
+        if stages:
+            print(f"{'':<22}{stages}")
+        if "commits" in result:
+            print(f"{'':<22}commits {result['commits']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de ingesta y procesamiento de archivos de staging")
+    parser.add_argument("--formats", default="csv,json,xlsx")
+    parser.add_argument("--rows", default="1000,100000", help="Filas por archivo, separadas por coma")
+    parser.add_argument("--files", type=int, default=1, help="Archivos (plataformas) por caso")
+    parser.add_argument("--url", help="Base de datos; por defecto un SQLite temporal")
+    parser.add_argument("--reset-db", action="store_true", help="Confirma que se pueden borrar las tablas de --url")
+    parser.add_argument("--data-dir", help="Carpeta para los archivos generados (se reutilizan entre ejecuciones)")
+    parser.add_argument("--chunk-size", type=int, help="PROCESSING_CHUNK_SIZE para el benchmark")
+    parser.add_argument("--workers", type=int, help="PROCESSING_WORKERS para el benchmark")
+    parser.add_argument("--engine", help="STAGING_DEFAULT_ENGINE para el benchmark (pandas o arrow)")
+    parser.add_argument("--projection", help="STAGING_DEFAULT_PROJECTION para el benchmark, p. ej. id")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Archivo JSON de resultados (por defecto bench_pipeline_<commit>.json)")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior para comparar filas/s")
+    args = parser.parse_args()
+
+    if args.url and not args.reset_db:
+        parser.error("--url borra las tablas de esa base: agregar --reset-db para confirmar")
+
+    env = {}
+    if args.chunk_size is not None:
+        env["PROCESSING_CHUNK_SIZE"] = str(args.chunk_size)
+    if args.workers is not None:
+        env["PROCESSING_WORKERS"] = str(args.workers)
+    if args.engine is not None:
+        env["STAGING_DEFAULT_ENGINE"] = args.engine
+    if args.projection is not None:
+        env["STAGING_DEFAULT_PROJECTION"] = args.projection
+
+    workdir = tempfile.mkdtemp(prefix="bench_pipeline_")
+    data_dir = args.data_dir or os.path.join(workdir, "source")
+    os.makedirs(data_dir, exist_ok=True)
+    database_url = args.url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+
+    # La app se importa en el proceso de cada caso, con cwd en la carpeta temporal;
+    # 'spawn' le pasa este sys.path
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    results = []
+    try:
+        for fmt in args.formats.split(","):
+            for rows in (int(value) for value in args.rows.split(",")):
+                path, rows = generate_file(data_dir, fmt, rows, args.seed)
+                case = {"format": fmt, "rows": rows, "files": args.files, "path": path}
+
+                case_dir = tempfile.mkdtemp(dir=workdir)
+                with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+                    results.append(executor.submit(run_case, case, database_url, case_dir, env).result())
+                shutil.rmtree(case_dir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    commit = git_commit()
+    report = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": database_url.split(":", 1)[0],
+        "settings": env,
+        "cases": results,
+    }
+    output = args.output or f"bench_pipeline_{commit}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"Resultados en {output}")
+
+
+if __name__ == "__main__":
+    main()
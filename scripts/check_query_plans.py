@@ -0,0 +1,82 @@
+import argparse
+import sys
+from datetime import datetime
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+from app.core.database import engine as default_engine
+from app.domain.repositories.page_repository import PageRepository
+from app.domain.repositories.page_rollup_repository import PageRollupRepository
+
+# Verifica que las consultas de lectura usan los índices de las migraciones d3a85f0c6e21, 5f9e0a7b2c44
+# (page_amount_rollup), a6d0c3f81e57 (fingerprint) y c2f7e91b4d06 (heartbeat_at):
+#   python -m scripts.check_query_plans [--url postgresql://...]
+# tests/test_query_plans.py corre las mismas consultas sobre el SQLite de los tests.
+# Se desactiva el seq scan para que el planner elija un índice aunque las tablas sean pequeñas;
+# si ningún índice sirve a la consulta, el plan sigue mostrando un Seq Scan.
+
+# (consulta, llamada con la sesión, índices válidos en el plan)
+CHECKS = [
+    # Ambos índices cubren (date, platform_id); el planner elige según las estadísticas
+    ("exists_in_date", lambda db: PageRepository(db).exists_in_date(1, "2025-01-01"),
+     ("uq_page_staging_data_platform_id_date", "ix_page_staging_data_date_status")),
+    ("get_all_pending", lambda db: PageRepository(db).get_all_pending("2025-01-01"),
+     ("ix_page_staging_data_date_status",)),
+    ("get_staging_from_date", lambda db: PageRepository(db).get_staging_from_date("2025-01-01"),
+     ("ix_page_staging_data_date_status",)),
+    # Con pocos registros 'completed' el planner puede preferir el índice de (status, heartbeat_at)
+    ("get_completed_by_fingerprint", lambda db: PageRepository(db).get_completed_by_fingerprint(1, "0" * 64, 0),
+     ("ix_page_staging_data_platform_id_fingerprint", "ix_page_staging_data_status_heartbeat_at")),
+    ("get_stale_processing", lambda db: PageRepository(db).get_stale_processing(datetime(2025, 1, 1)),
+     ("ix_page_staging_data_status_heartbeat_at",)),
+    ("total_amount_month", lambda db: PageRollupRepository(db).total_amount_month(2025, 1),
+     ("ix_page_amount_rollup_day",)),
+]
+
+
+def explain(connection, call, db):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", capture)
+    try:
+        call(db)
+    finally:
+        event.remove(connection, "before_cursor_execute", capture)
+
+    statement, parameters = statements[-1]
+    # SQLite (tests/test_query_plans.py) describe el plan en la última columna de EXPLAIN QUERY PLAN
+    if connection.dialect.name == "sqlite":
+        rows = [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+    else:
+        rows = connection.exec_driver_sql(f"EXPLAIN {statement}", parameters).scalars().all()
+    return "\n".join(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Revisa los planes de las consultas de lectura")
+    parser.add_argument("--url", help="URL de la base de datos (por defecto la de la aplicación)")
+    args = parser.parse_args()
+
+    engine = create_engine(args.url) if args.url else default_engine
+    failures = 0
+    with engine.connect() as connection:
+        connection.exec_driver_sql("SET enable_seqscan = off")
+        db = Session(bind=connection)
+
+        for name, call, indexes in CHECKS:
+            plan = explain(connection, call, db)
+            ok = any(index in plan for index in indexes)
+            failures += not ok
+            print(f"[{'OK' if ok else 'FAIL'}] {name}: {' | '.join(indexes)}")
+            if not ok:
+                print(plan)
+
+        connection.rollback()
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+# La configuración se lee del entorno al importar la app: los tests usan un SQLite y un
+# data lake temporales
+_workdir = tempfile.mkdtemp(prefix="pages-ms-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_workdir}/tests.db"
+os.environ["DATA_LAKE_DIR"] = os.path.join(_workdir, "raw")
+os.environ["DATA_LAKE_PROCESSED_DIR"] = os.path.join(_workdir, "processed")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    from app.core.database import Base, engine, session_scope
+
+    Base.metadata.create_all(engine)
+    try:
+        with session_scope() as session:
+            yield session
+    finally:
+        Base.metadata.drop_all(engine)
+
+
+# Data lake temporal para page_service (los archivos crudos y los procesados)
+@pytest.fixture
+def data_lake(tmp_path, monkeypatch):
+    from app.core.storage import DataLakeStorage
+    from app.services import page_service
+
+    raw = DataLakeStorage(str(tmp_path / "raw"), "gzip")
+    processed = DataLakeStorage(str(tmp_path / "processed"), "gzip")
+    monkeypatch.setattr(page_service, "raw_storage", raw)
+    monkeypatch.setattr(page_service, "processed_storage", processed)
+    return raw, processed
+
+
+# Filas con la forma de las respuestas de las plataformas: montos con símbolo y separador de
+# miles, y una fila repetida cada 'duplicate_every'
+def sample_rows(count, duplicate_every=5):
+    rows = []
+    for i in range(count):
+        if duplicate_every and i % duplicate_every == duplicate_every - 1:
+            rows.append(dict(rows[-1]))
+        else:
+            rows.append({"id": i, "model_name": f"model-{i % 3}", "amount": f"${1000 + i * 10.5:,.2f}"})
+    return rows
+
+
+# Crea un registro 'pending' con un CSV en el data lake: add_staging(platform_id, date, rows)
+@pytest.fixture
+def add_staging(db, data_lake, tmp_path):
+    import pandas as pd
+    from app.domain.repositories.page_repository import PageRepository
+
+    def add(platform_id, date, rows):
+        path = tmp_path / f"staging-{platform_id}-{date}.csv"
+        pd.DataFrame(rows).to_csv(path, index=False)
+        stored = data_lake[0].store_file(str(path), platform_id, date, "csv")
+        return PageRepository(db).create({
+            "date": date, "platform_id": platform_id, "file_path": stored.path, "status": "pending",
+        })
+
+    return add
+
+
+# API de origen para save_to_data_lake: sirve los archivos de 'files' con el Content-Type de
+# su extensión. /slow tarda un segundo en responder (para el timeout de lectura).
+class _StagingFileHandler(SimpleHTTPRequestHandler):
+    content_types = {
+        "csv": "text/csv",
+        "json": "application/json",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(1)
+        return super().do_GET()
+
+    def guess_type(self, path):
+        return self.content_types.get(path.rsplit(".", 1)[-1], "application/octet-stream")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def files(tmp_path):
+    directory = tmp_path / "files"
+    directory.mkdir()
+    return directory
+
+
+# Servidor HTTP local sobre 'files'; server.url(name) es la URL de un archivo
+@pytest.fixture
+def server(files):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_StagingFileHandler, directory=str(files)))
+    server.url = lambda name: f"http://127.0.0.1:{server.server_port}/{name}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,41 @@
+import os
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.domain.models.page_model import PageProcessedData
+from app.domain.repositories.page_repository import PageRepository
+
+# insert_bulk_data guarda lo mismo con INSERT (SQLite) y con COPY (PostgreSQL). La variante de
+# PostgreSQL corre con TEST_POSTGRES_URL apuntando a una base descartable.
+
+
+@pytest.fixture
+def postgres_db():
+    url = os.getenv("TEST_POSTGRES_URL")
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL no está definida")
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    db = Session(bind=engine)
+    yield db
+    db.close()
+    Base.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.mark.parametrize("backend", ["db", "postgres_db"])
+def test_empty_text_is_stored_as_empty_string(request, backend):
+    db = request.getfixturevalue(backend)
+    repository = PageRepository(db)
+    record = repository.create({"date": "2025-01-15", "platform_id": 1, "file_path": "x.csv", "status": "processing"})
+
+    repository.insert_bulk_data(pd.DataFrame({
+        "staging_data_id": [record.id, record.id],
+        "model_name": ["", "model"],
+        "amount": [1.5, 2.0],
+    }))
+
+    rows = db.query(PageProcessedData.model_name, PageProcessedData.amount).order_by(PageProcessedData.id).all()
+    assert [(name, float(amount)) for name, amount in rows] == [("", 1.5), ("model", 2.0)]
@@ -0,0 +1,66 @@
+import time
+from app.config.codec import JSON, MSGPACK, ZSTD
+from app.core.cache import (
+    TTLCache,
+    all_pages_key,
+    invalidate_date,
+    reply_cache,
+    staging_from_date_key,
+    total_amount_month_key,
+)
+
+# TTLCache: vencimiento, desalojo LRU e invalidación por fecha
+
+
+def test_entries_expire_after_the_ttl():
+    cache = TTLCache(max_entries=4, ttl_seconds=0.05)
+    cache.set("key", "value")
+    assert cache.get("key") == "value"
+
+    time.sleep(0.1)
+
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2, ttl_seconds=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_value_read_before_an_invalidation_is_not_stored():
+    cache = TTLCache(max_entries=4, ttl_seconds=60)
+    version = cache.version()
+    cache.invalidate(lambda key: True)
+
+    cache.set("key", "stale", version)
+
+    assert cache.get("key") is None
+
+
+def test_invalidate_date_drops_only_the_affected_reads():
+    # Cada lectura se guarda una vez por formato de respuesta
+    keys = [
+        all_pages_key(),
+        staging_from_date_key("2025-01-15"),
+        staging_from_date_key("2025-01-16"),
+        total_amount_month_key(2025, 1),
+        total_amount_month_key(2025, 2),
+    ]
+    reply_cache.clear()
+    for key in keys:
+        for reply_format in ((JSON, None), (MSGPACK, ZSTD)):
+            reply_cache.set((key, reply_format), "reply")
+
+    invalidate_date("2025-01-15")
+
+    kept = [key for key in keys if reply_cache.get((key, (JSON, None))) is not None]
+    assert kept == [staging_from_date_key("2025-01-16"), total_amount_month_key(2025, 2)]
+    assert reply_cache.stats()["entries"] == 4
+    reply_cache.clear()
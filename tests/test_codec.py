@@ -0,0 +1,93 @@
+import gzip
+import json
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+import pytest
+from app.config import codec
+from app.config.codec import GZIP, JSON, MSGPACK, ZSTD, decode, encode, negotiate
+
+# Negociación del formato de las respuestas de NATS y su lectura del lado del cliente
+
+PAYLOAD = {"status": 200, "message": "Success", "data": [{"id": i, "amount": Decimal("1.5")} for i in range(50)]}
+
+
+def _roundtrip(payload, reply_format):
+    data, headers = encode(payload, *reply_format)
+    return data, headers, decode(SimpleNamespace(data=data, headers=headers))
+
+
+@pytest.fixture
+def threshold(monkeypatch):
+    monkeypatch.setattr(codec, "CODEC_COMPRESSION_THRESHOLD", 200)
+
+
+def test_default_is_uncompressed_json_without_headers():
+    data, headers, decoded = _roundtrip(PAYLOAD, negotiate(None))
+
+    assert negotiate({}) == (JSON, None)
+    assert headers is None
+    assert json.loads(data) == decoded
+    assert decoded["data"][0] == {"id": 0, "amount": 1.5}
+
+
+def test_accept_msgpack():
+    reply_format = negotiate({"Accept": MSGPACK})
+    data, headers, decoded = _roundtrip(PAYLOAD, reply_format)
+
+    assert reply_format == (MSGPACK, None)
+    assert headers == {"Content-Type": MSGPACK}
+    assert codec.msgpack.unpackb(data) == decoded
+    assert decoded["data"][49] == {"id": 49, "amount": 1.5}
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("zstd, gzip", ZSTD),
+    ("gzip", GZIP),
+    ("br", None),
+])
+def test_accept_encoding_above_the_threshold(threshold, accept_encoding, encoding):
+    reply_format = negotiate({"Accept-Encoding": accept_encoding})
+    data, headers, decoded = _roundtrip(PAYLOAD, reply_format)
+
+    assert reply_format == (JSON, encoding)
+    assert (headers or {}).get("Content-Encoding") == encoding
+    assert decoded["status"] == 200 and len(decoded["data"]) == 50
+    if encoding == GZIP:
+        assert json.loads(gzip.decompress(data)) == decoded
+
+
+def test_accept_encoding_below_the_threshold(threshold):
+    small = {"status": 200, "message": "Success", "data": date(2025, 1, 15)}
+    data, headers, decoded = _roundtrip(small, negotiate({"Accept-Encoding": "zstd, gzip"}))
+
+    assert headers is None
+    assert len(data) < 200
+    assert decoded["data"] == "2025-01-15"
+
+
+def test_fallback_without_the_optional_packages(threshold, monkeypatch):
+    monkeypatch.setattr(codec, "msgpack", None)
+    monkeypatch.setattr(codec, "zstandard", None)
+
+    reply_format = negotiate({"Accept": MSGPACK, "Accept-Encoding": "zstd, gzip"})
+    data, headers, decoded = _roundtrip(PAYLOAD, reply_format)
+
+    assert reply_format == (JSON, GZIP)
+    assert headers == {"Content-Encoding": GZIP}
+    assert negotiate({"Accept-Encoding": "zstd"}) == (JSON, None)
+    assert decoded["data"][0] == {"id": 0, "amount": 1.5}
+
+
+def test_fallback_without_orjson(monkeypatch):
+    monkeypatch.setattr(codec, "orjson", None)
+
+    data, headers, decoded = _roundtrip(PAYLOAD, negotiate(None))
+
+    assert headers is None
+    assert decoded == json.loads(data)
+    assert decoded["data"][0] == {"id": 0, "amount": 1.5}
+
+
+def test_decode_empty_message():
+    assert decode(SimpleNamespace(data=b"", headers=None)) == {}
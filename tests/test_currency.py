@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+from app.core.metrics import PROCESSING_ROWS
+from app.services.currency import parse_amounts
+from app.services.jobs import get_page_service
+
+# parse_amounts: formatos aceptados por locale y valores rechazados
+
+NAN = float("nan")
+
+CASES = [
+    # (locale, texto, monto; NaN = rechazado)
+    ("us", "$1,234.50", 1234.5),
+    ("us", "1234.5", 1234.5),
+    ("us", "US$ 12.00", 12.0),
+    ("us", "USD 7", 7.0),
+    ("us", "EUR 3.25", 3.25),
+    ("us", "€3.25", 3.25),
+    ("us", "(12.00)", -12.0),
+    ("us", "$(12.00)", -12.0),
+    ("us", "-5", -5.0),
+    ("us", " 0.1 ", 0.1),
+    ("us", "12345678901234567.5", float("12345678901234567.5")),
+    ("eu", "1.234,50", 1234.5),
+    ("eu", "€ 1.234,50", 1234.5),
+    ("eu", "-0,5", -0.5),
+    ("us", "", NAN),
+    ("us", "abc", NAN),
+    ("us", "$", NAN),
+    ("us", "1.2.3", NAN),
+    ("us", "--5", NAN),
+    ("us", "5-", NAN),
+    ("us", "(12.00", NAN),
+    ("us", "12)", NAN),
+    ("us", "1e5", NAN),
+    ("us", "nan", NAN),
+    ("us", "1" * 70, NAN),
+    ("eu", "1,2,3", NAN),
+]
+
+
+@pytest.mark.parametrize("locale, text, expected", CASES, ids=[f"{case[0]}:{case[1][:20]!r}" for case in CASES])
+def test_parse_amount(locale, text, expected):
+    amounts, rejected = parse_amounts(pd.Series([text], dtype=object), locale)
+
+    assert rejected.tolist() == [np.isnan(expected)]
+    if not np.isnan(expected):
+        assert amounts[0] == expected
+
+
+def test_parse_amounts_nulls_and_numeric_columns():
+    amounts, rejected = parse_amounts(pd.Series(["$1.00", None, NAN], dtype=object))
+    assert amounts[0] == 1.0
+    assert rejected.tolist() == [False, True, True]
+
+    amounts, rejected = parse_amounts(pd.Series([1.5, NAN]))
+    assert amounts[0] == 1.5
+    assert rejected.tolist() == [False, True]
+
+
+def test_parse_amounts_unknown_locale():
+    with pytest.raises(ValueError, match="Locale de montos no soportado"):
+        parse_amounts(pd.Series(["1"]), "jp")
+
+
+def test_clean_dataframe_counts_rejected_amounts(db):
+    df = pd.DataFrame({"model_name": ["a", "b", "c", "d"], "amount": ["$1.00", "abc", "", "(2.00)"]})
+    before = PROCESSING_ROWS.value(stage="amount_rejected")
+
+    clean = get_page_service(db)._clean_dataframe(df, "us")
+
+    # Los rechazados se cuentan; los negativos se descartan sin contarse como rechazados
+    assert clean.values.tolist() == [["a", 1.0]]
+    assert PROCESSING_ROWS.value(stage="amount_rejected") - before == 2
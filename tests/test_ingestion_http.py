@@ -0,0 +1,121 @@
+import os
+import time
+import pandas as pd
+import pytest
+import requests
+from app.core.metrics import HTTP_FETCH_SECONDS
+from app.core.storage import open_text
+from app.domain.models.page_model import PageStagingData, PageStagingLog
+from app.services import page_service
+from app.services.jobs import get_page_service
+from conftest import sample_rows
+
+# Ingesta de save_to_data_lake contra el servidor HTTP local de tests/conftest.py
+
+
+@pytest.fixture
+def storage(data_lake):
+    return data_lake[0]
+
+
+def _write(files, fmt, rows):
+    path = files / f"staging_{rows}.{fmt}"
+    df = pd.DataFrame(sample_rows(rows))
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    else:
+        df.to_json(path, orient="records")
+    return str(path)
+
+
+def _stored_files(storage):
+    return [name for _, _, names in os.walk(storage.root) for name in names]
+
+
+@pytest.mark.parametrize("fmt", ["csv", "json"])
+def test_download_is_streamed_to_the_data_lake(db, files, server, storage, monkeypatch, fmt):
+    path = _write(files, fmt, 2000)
+    monkeypatch.setattr(page_service, "PAGE_URLS", {1: server.url(os.path.basename(path))})
+    monkeypatch.setattr(page_service, "HTTP_CHUNK_SIZE", 4096)
+
+    # El cuerpo se escribe por bloques de HTTP_CHUNK_SIZE, sin leerlo completo
+    chunk_sizes = []
+    iter_content = requests.Response.iter_content
+
+    def recording_iter_content(response, chunk_size=1, decode_unicode=False):
+        chunk_sizes.append(chunk_size)
+        return iter_content(response, chunk_size, decode_unicode)
+
+    monkeypatch.setattr(requests.Response, "iter_content", recording_iter_content)
+
+    record = get_page_service(db).save_to_data_lake({"page_id": 1, "date": "2025-01-15"})
+
+    assert record.status == "pending"
+    assert record.fingerprint
+    assert chunk_sizes == [4096]
+    with open_text(storage.path(record.file_path)) as stored, open(path, encoding="utf-8", newline="") as source:
+        assert stored.read() == source.read()
+
+
+def test_fetch_time_excludes_sidecar_and_fingerprint(db, files, server, storage, monkeypatch):
+    path = _write(files, "csv", 200)
+    monkeypatch.setattr(page_service, "PAGE_URLS", {1: server.url(os.path.basename(path))})
+
+    # El sidecar y el fingerprint trabajan sobre el archivo local, después de cerrar la respuesta
+    write_excel_sidecar = page_service.PageService._write_excel_sidecar
+
+    def slow_sidecar(service, file_path):
+        time.sleep(0.5)
+        return write_excel_sidecar(service, file_path)
+
+    monkeypatch.setattr(page_service.PageService, "_write_excel_sidecar", slow_sidecar)
+    count, seconds = HTTP_FETCH_SECONDS.totals().get(("127.0.0.1",), (0, 0))
+
+    get_page_service(db).save_to_data_lake({"page_id": 1, "date": "2025-01-15"})
+
+    after_count, after_seconds = HTTP_FETCH_SECONDS.totals()[("127.0.0.1",)]
+    assert after_count == count + 1
+    assert after_seconds - seconds < 0.5
+
+
+def test_download_over_the_size_limit_is_rejected(db, files, server, storage, monkeypatch):
+    path = _write(files, "csv", 2000)
+    monkeypatch.setattr(page_service, "PAGE_URLS", {1: server.url(os.path.basename(path))})
+    monkeypatch.setattr(page_service, "HTTP_MAX_DOWNLOAD_BYTES", os.path.getsize(path) - 1)
+
+    with pytest.raises(Exception, match="File too large"):
+        get_page_service(db).save_to_data_lake({"page_id": 1, "date": "2025-01-15"})
+
+    assert _stored_files(storage) == []
+    assert db.query(PageStagingData).count() == 0
+
+
+def test_size_limit_without_content_length(monkeypatch):
+    monkeypatch.setattr(page_service, "HTTP_MAX_DOWNLOAD_BYTES", 5)
+
+    assert list(page_service._limit_size(iter([b"ab", b"cde"]), None)) == [b"ab", b"cde"]
+    with pytest.raises(ValueError, match="File too large"):
+        list(page_service._limit_size(iter([b"abc", b"def"]), None))
+
+
+def test_http_error_is_logged(db, server, storage, monkeypatch):
+    monkeypatch.setattr(page_service, "PAGE_URLS", {1: server.url("missing.csv")})
+
+    with pytest.raises(Exception, match="Error consuming API: 404"):
+        get_page_service(db).save_to_data_lake({"page_id": 1, "date": "2025-01-15"})
+
+    record = db.query(PageStagingData).one()
+    assert record.status == "request_error"
+    assert "404" in db.query(PageStagingLog).one().error_description
+    assert _stored_files(storage) == []
+
+
+def test_read_timeout_is_logged(db, server, storage, monkeypatch):
+    monkeypatch.setattr(page_service, "PAGE_URLS", {1: server.url("slow")})
+    monkeypatch.setattr(page_service, "HTTP_READ_TIMEOUT", 0.2)
+
+    with pytest.raises(Exception, match="API request failed"):
+        get_page_service(db).save_to_data_lake({"page_id": 1, "date": "2025-01-15"})
+
+    assert db.query(PageStagingData).one().status == "request_error"
+    assert _stored_files(storage) == []
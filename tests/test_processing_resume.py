@@ -0,0 +1,113 @@
+import os
+from datetime import datetime, timedelta
+import pandas as pd
+import pytest
+from sqlalchemy import func
+from app.core.database import session_scope
+from app.core.storage import open_text
+from app.domain.models.page_model import (
+    PageAmountRollup,
+    PageProcessedData,
+    PageProcessingCheckpoint,
+    PageStagingData,
+    PageStagingLog,
+)
+from app.domain.repositories.page_repository import PageRepository
+from app.services import jobs, page_service
+from conftest import sample_rows
+
+# Procesamiento por chunks: retomar un archivo cortado y perder el lease a mitad de camino
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    monkeypatch.setattr(page_service, "PROCESSING_CHUNK_SIZE", 4)
+
+
+# insert_bulk_data que llama a before(call) antes de cada chunk (call empieza en 1)
+def _on_insert(monkeypatch, before):
+    insert_bulk_data = PageRepository.insert_bulk_data
+    calls = []
+
+    def wrapper(repository, df, commit=True):
+        calls.append(len(df))
+        before(len(calls))
+        return insert_bulk_data(repository, df, commit)
+
+    monkeypatch.setattr(PageRepository, "insert_bulk_data", wrapper)
+
+
+def _totals(db, record):
+    rows = db.query(PageProcessedData).filter(PageProcessedData.staging_data_id == record.id)
+    rollup = db.query(func.sum(PageAmountRollup.row_count), func.sum(PageAmountRollup.total_amount)).filter(
+        PageAmountRollup.platform_id == record.platform_id).one()
+    return rows.count(), float(rows.with_entities(func.sum(PageProcessedData.amount)).scalar()), tuple(map(float, rollup))
+
+
+def _processed_csv(data_lake, record):
+    with open_text(data_lake[1].path(record.file_path_processed)) as csv_file:
+        return pd.read_csv(csv_file).drop(columns="staging_data_id")
+
+
+def test_resume_after_a_crash_matches_a_clean_run(db, add_staging, data_lake, chunked, monkeypatch):
+    # El mismo archivo en dos plataformas: una se procesa de corrido, la otra se corta
+    rows = sample_rows(30)
+    clean = add_staging(1, "2025-01-15", rows)
+    jobs.get_page_service(db).processing_data("2025-01-15", workers=1)
+
+    crashed = add_staging(2, "2025-01-16", rows)
+
+    def crash(call):
+        # El CSV del cuarto chunk ya está escrito, sus filas y su checkpoint no
+        if call == 4:
+            raise KeyboardInterrupt("proceso terminado")
+
+    with monkeypatch.context() as patch:
+        _on_insert(patch, crash)
+        with pytest.raises(KeyboardInterrupt):
+            jobs.get_page_service(db).processing_data("2025-01-16", workers=1)
+    db.rollback()
+
+    partial_path = data_lake[1].partial_path(crashed.platform_id, crashed.date, f"{crashed.id}.csv")
+    assert db.query(PageProcessingCheckpoint.chunk_index).filter(
+        PageProcessingCheckpoint.staging_data_id == crashed.id).all() == [(0,), (1,), (2,)]
+    assert os.path.getsize(partial_path) > db.query(func.max(PageProcessingCheckpoint.output_offset)).scalar()
+
+    # El heartbeat venció: resume_processing lo retoma desde el último checkpoint
+    db.query(PageStagingData).filter(PageStagingData.id == crashed.id).update(
+        {"heartbeat_at": datetime.now() - timedelta(hours=1)})
+    db.commit()
+    res = jobs.resume_processing_job("2025-01-16")
+
+    assert [item["id"] for item in res["data"]] == [crashed.id]
+    db.expire_all()
+    clean, crashed = db.get(PageStagingData, clean.id), db.get(PageStagingData, crashed.id)
+    assert crashed.status.value == "completed"
+    assert _totals(db, crashed) == _totals(db, clean)
+    # El parcial se recortó al último checkpoint: la salida no repite las filas del chunk cortado
+    assert _processed_csv(data_lake, crashed).equals(_processed_csv(data_lake, clean))
+    assert db.query(PageProcessingCheckpoint).count() == 0
+    assert not os.path.exists(partial_path)
+
+
+def test_worker_that_loses_the_lease_stops_without_failing(db, add_staging, chunked, monkeypatch):
+    record = add_staging(1, "2025-01-15", sample_rows(30))
+
+    def steal(call):
+        # Otro proceso lo retoma después del primer checkpoint
+        if call == 2:
+            with session_scope() as other:
+                other.query(PageStagingData).filter(PageStagingData.id == record.id).update({"lease_token": "otro"})
+                other.commit()
+
+    _on_insert(monkeypatch, steal)
+    jobs.get_page_service(db).processing_data("2025-01-15", workers=1)
+
+    db.expire_all()
+    record = db.get(PageStagingData, record.id)
+    assert record.status.value == "processing"
+    assert record.lease_token == "otro"
+    assert db.query(PageStagingLog).count() == 0
+    # Solo queda lo confirmado antes de perderlo, para que el nuevo dueño siga desde ahí
+    assert db.query(PageProcessingCheckpoint.chunk_index).all() == [(0,)]
+    assert db.query(PageProcessedData).count() == 4
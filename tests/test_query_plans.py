@@ -0,0 +1,17 @@
+import pytest
+from scripts.check_query_plans import CHECKS, explain
+
+# Las consultas de scripts/check_query_plans.py usan sus índices también en el SQLite de los tests
+
+
+# En SQLite la restricción única de (platform_id, date) es el índice sqlite_autoindex_page_staging_data_1
+def _sqlite_indexes(indexes):
+    return tuple("sqlite_autoindex_page_staging_data_1" if index == "uq_page_staging_data_platform_id_date" else index
+                 for index in indexes)
+
+
+@pytest.mark.parametrize("name, call, indexes", CHECKS, ids=[check[0] for check in CHECKS])
+def test_query_uses_index(db, name, call, indexes):
+    plan = explain(db.connection(), call, db)
+
+    assert any(index in plan for index in _sqlite_indexes(indexes)), plan
@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+from app.domain.models.page_model import PageStagingData
+from app.domain.repositories.page_repository import PageRepository
+from app.services import jobs, scheduler as scheduler_module
+from app.services.scheduler import Scheduler
+from conftest import sample_rows
+
+# Scheduler: la toma de registros entre nodos y el apagado con trabajos en curso
+
+
+def test_concurrent_claimers_never_take_the_same_record(db):
+    PageRepository(db).create_many([
+        {"date": "2025-01-15", "platform_id": platform_id, "file_path": "x.csv", "status": "pending"}
+        for platform_id in range(1, 41)
+    ])
+    claimed = [[] for _ in range(4)]
+    start = threading.Barrier(len(claimed))
+
+    def claimer(ids):
+        start.wait()
+        while True:
+            records = jobs.claim_pending_job(3)
+            if not records:
+                return
+            ids.extend(record["id"] for record in records)
+
+    threads = [threading.Thread(target=claimer, args=(ids,)) for ids in claimed]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_ids = [staging_id for ids in claimed for staging_id in ids]
+    assert len(all_ids) == len(set(all_ids)) == 40
+
+
+def test_stop_waits_for_in_flight_records(db, add_staging, monkeypatch):
+    for platform_id in range(1, 6):
+        add_staging(platform_id, "2025-01-15", sample_rows(10))
+
+    def slow_processing_claimed_job(staging_id, lease_token):
+        time.sleep(0.3)
+        return jobs.processing_claimed_job(staging_id, lease_token)
+
+    monkeypatch.setattr(scheduler_module, "processing_claimed_job", slow_processing_claimed_job)
+    monkeypatch.setattr(scheduler_module, "resume_processing_job", lambda date: {"data": []})
+    scheduler = Scheduler(poll_seconds=0.05, batch_size=2, max_in_flight=2, ingest_platforms=[],
+                          ingest_days_ahead=0, ingest_interval=60, resume_interval=60)
+
+    async def run():
+        scheduler.start()
+        while not any(record.status.value == "processing" for record in db.query(PageStagingData)):
+            db.expire_all()
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    asyncio.run(run())
+
+    # Lo que se tomó terminó antes de que stop retorne; el resto sigue pendiente
+    db.expire_all()
+    statuses = [record.status.value for record in db.query(PageStagingData)]
+    assert "completed" in statuses
+    assert set(statuses) <= {"completed", "pending"}
+    assert not scheduler._tasks
@@ -0,0 +1,79 @@
+import json
+import pandas as pd
+import pytest
+from app.services.jobs import get_page_service
+from app.domain.models.page_model import PageProcessedData
+from app.services import page_service, staging_reader
+from app.services.page_service import _SeenRows
+from app.services.staging_reader import read_staging_chunks
+from conftest import sample_rows
+
+# Lectura por chunks: el límite de memoria en todos los lectores y los duplicados entre chunks
+
+
+def _wide_rows(count):
+    # ~20 KB por fila: con 1 MB de límite entran 17 filas por chunk
+    return [{"id": str(i), "model_name": "model", "amount": "1.00", "notes": "x" * 20000} for i in range(count)]
+
+
+def _write(path, fmt, rows):
+    df = pd.DataFrame(rows)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "json":
+        df.to_json(path, orient="records", lines=True)
+    else:
+        df.to_parquet(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("fmt, engine", [
+    ("csv", "pandas"), ("json", "pandas"), ("parquet", "pandas"),
+    ("csv", "arrow"), ("json", "arrow"),
+])
+def test_memory_limit_shrinks_chunks(tmp_path, monkeypatch, fmt, engine):
+    path = _write(tmp_path / f"wide.{fmt}", fmt, _wide_rows(200))
+    monkeypatch.setattr(staging_reader, "PROCESSING_MEMORY_LIMIT_MB", 1)
+
+    chunks = list(read_staging_chunks(path, 100, engine))
+
+    # El primer chunk mide las filas; los siguientes se ajustan al límite
+    assert [len(chunk) for chunk in chunks[:2]] == [100, 17]
+    assert max(len(chunk) for chunk in chunks[1:]) == 17
+    assert pd.concat(chunks)["id"].astype(str).tolist() == [str(i) for i in range(200)]
+
+
+def test_arrow_json_falls_back_to_pandas_after_a_type_change(tmp_path):
+    # Los tipos se infieren del primer bloque (1 MB); después amount pasa a ser un número
+    path = tmp_path / "mixed.json"
+    with open(path, "w") as json_file:
+        for i in range(3000):
+            amount = f"${i}.00" if i < 2000 else i
+            json_file.write(json.dumps({"id": i, "model_name": "model", "amount": amount, "notes": "x" * 500}) + "\n")
+
+    chunks = list(read_staging_chunks(str(path), 400, "arrow"))
+
+    df = pd.concat(chunks)
+    assert df["id"].astype(int).tolist() == list(range(3000))
+    assert df["amount"].astype(str).tolist()[1999:2001] == ["$1999.00", "2000"]
+
+
+def test_seen_rows_drops_duplicates_across_chunks():
+    seen = _SeenRows()
+    first = pd.DataFrame({"model_name": ["a", "b", "b"], "amount": ["1", "2", "2"]})
+    second = pd.DataFrame({"model_name": ["b", "c", "a"], "amount": ["2", "3", "9"]})
+
+    assert seen.drop_duplicates(first).values.tolist() == [["a", "1"], ["b", "2"]]
+    assert seen.drop_duplicates(second).values.tolist() == [["c", "3"], ["a", "9"]]
+
+
+def test_processing_drops_duplicates_across_chunks(db, add_staging, monkeypatch):
+    # La fila 4 repite la 3 y queda en el chunk siguiente
+    monkeypatch.setattr(page_service, "PROCESSING_CHUNK_SIZE", 4)
+    record = add_staging(1, "2025-01-15", sample_rows(10))
+
+    get_page_service(db).processing_data("2025-01-15", workers=1)
+
+    db.refresh(record)
+    assert record.status.value == "completed"
+    assert db.query(PageProcessedData).count() == 8
@@ -0,0 +1,77 @@
+import pytest
+from app.services.jobs import get_page_service
+from app.core.database import session_scope
+from app.core.metrics import DB_BATCH_COMMITS
+from app.domain.models.page_model import PageStagingData, PageStagingLog
+from app.domain.repositories.page_repository import PageRepository
+from app.domain.repositories.page_unit_of_work import PageUnitOfWork
+from app.services import page_service
+from conftest import sample_rows
+
+# PageUnitOfWork: los 'failed' diferidos no pisan a otro proceso, y los commits por lote
+
+
+def _claim(db, count):
+    repository = PageRepository(db)
+    repository.create_many([
+        {"date": "2025-01-15", "platform_id": platform_id, "file_path": "x.csv", "status": "pending"}
+        for platform_id in range(1, count + 1)
+    ])
+    return repository.claim_pending(date="2025-01-15")
+
+
+def test_flush_does_not_overwrite_a_record_completed_elsewhere(db):
+    failed, completed = _claim(db, 2)
+
+    with PageUnitOfWork(db) as uow:
+        for record in (failed, completed):
+            uow.change_status(record, "failed", record.lease_token)
+            uow.add_log(record.id, "error")
+
+        # Otro proceso termina el segundo antes del flush
+        with session_scope() as other:
+            PageRepository(other).complete_processing(completed.id, completed.lease_token, "processed.csv")
+
+    db.expire_all()
+    assert db.get(PageStagingData, failed.id).status == "failed"
+    assert db.get(PageStagingData, completed.id).status == "completed"
+    assert db.get(PageStagingData, completed.id).file_path_processed == "processed.csv"
+    assert db.query(PageStagingLog).count() == 2
+
+
+def test_flush_does_not_overwrite_a_record_with_another_lease(db):
+    record, = _claim(db, 1)
+    lease_token = record.lease_token
+
+    with PageUnitOfWork(db) as uow:
+        uow.change_status(record, "failed", lease_token)
+        # Otro proceso lo retoma con un lease nuevo
+        with session_scope() as other:
+            other.query(PageStagingData).filter(PageStagingData.id == record.id).update({"lease_token": "otro"})
+            other.commit()
+
+    db.expire_all()
+    assert db.get(PageStagingData, record.id).status == "processing"
+
+
+def _batch_commits():
+    return DB_BATCH_COMMITS.totals().get(("processing_data",), (0, 0))[1]
+
+
+@pytest.mark.parametrize("chunk_size, commits", [
+    # La toma del lote y el paso a 'completed' de cada archivo, más el flush del que falló
+    (0, 1 + 3 + 1),
+    # Además, un checkpoint por chunk: 10 filas en chunks de 4 son 3 chunks por archivo
+    (4, 1 + 3 * (3 + 1) + 1),
+])
+def test_processing_data_commits_per_batch(db, add_staging, monkeypatch, chunk_size, commits):
+    monkeypatch.setattr(page_service, "PROCESSING_CHUNK_SIZE", chunk_size)
+    for platform_id in range(1, 4):
+        add_staging(platform_id, "2025-01-15", sample_rows(10))
+    PageRepository(db).create({"date": "2025-01-15", "platform_id": 9, "file_path": "bad.txt", "status": "pending"})
+
+    before = _batch_commits()
+    result = get_page_service(db).processing_data("2025-01-15", workers=1)
+
+    assert sorted(record.status.value for record in result) == ["completed", "completed", "completed", "failed"]
+    assert _batch_commits() - before == commits